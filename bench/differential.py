@@ -0,0 +1,113 @@
+'''
+Differential check of the regexp-free matcher against the regexp it replaces,
+and of the line diff engine against known edits.
+
+    python bench/differential.py [--cases N] [--seed SEED]
+
+Random texts, made of words and all sorts of whitespace, are searched with both
+core.CharClassMatcher and the equivalent regexp, for several character classes
+and both values of include_empty_lines, whole and by lines. Files made of the
+same few lines over and over, with lines edited, inserted and deleted here and
+there, are diffed with diff.changed_lines, which must find the lines edited or
+inserted, and only them. The exit status is 1 if any result differs.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from typing import List, Optional, Tuple
+import argparse
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core  # noqa: E402
+import diff  # noqa: E402
+
+REGEXPS = ['[ \t]+', '[ \\t]+', '[ ]+', '[\\t]+', '[ \\t\\u00a0]+', '[ \\t\\v\\f]+', '[\\x20\\u3000]+']
+# some characters are whitespace, some only look like it
+ALPHABET = ['a', 'b', '#', ' ', ' ', '  ', '\t', '\v', '\f', '\xa0', '\u3000', '\x1c', '\u200b', '\n', '\n', '\n\n']
+
+
+# Private: Generates a random text.
+def text(rng: random.Random) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 200)))
+
+
+# Private: Generates a file with few distinct lines, and edits it.
+#
+# Returns the lines before and after, and the numbers of the lines edited or
+# inserted.
+def edited_file(rng: random.Random) -> Tuple[List[str], List[str], List[int]]:
+    distinct = ['    value = 0  ', '    }', '', '\t'][:rng.randint(1, 4)]
+    size = rng.choice([10, 100, 3000])
+    if rng.random() < 0.5:
+        old = [distinct[i % len(distinct)] for i in range(size)]
+    else:
+        old = [rng.choice(distinct) for _ in range(size)]
+
+    # lines edited or inserted are unique, so that they are told apart
+    new: List[Tuple[str, bool]] = [(line, False) for line in old]
+    for _ in range(rng.randint(1, max(1, size // 50))):
+        row = rng.randrange(len(new) + 1)
+        action = rng.random()
+        if action < 0.5 and row < len(new):
+            new[row] = (new[row][0] + 'x%d' % row, True)
+        elif action < 0.75:
+            new.insert(row, ('inserted %d' % row, True))
+        elif row < len(new):
+            del new[row]
+    return old, [line for line, _ in new], [row for row, (_, edited) in enumerate(new) if edited]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    failures = 0
+    for regexp in REGEXPS:
+        for include_empty_lines in (True, False):
+            matcher = core.compile_pattern(regexp, include_empty_lines)
+            if not isinstance(matcher, core.CharClassMatcher):
+                print('not optimized: %r' % regexp)
+                failures += 1
+                continue
+            pattern = re.compile(core.search_regexp(regexp, include_empty_lines), re.MULTILINE)
+
+            for _ in range(args.cases):
+                sample = text(rng)
+                # a line-aligned part, as the plugin searches the visible region
+                begin = sample.rfind('\n', 0, rng.randint(0, len(sample))) + 1
+                end = sample.find('\n', rng.randint(begin, len(sample)))
+                end = len(sample) if end < 0 else end
+                for offset, part in ((0, sample), (begin, sample[begin:end])):
+                    expected = core.find_all(pattern, part, offset)
+                    found = core.find_all(matcher, part, offset)
+                    if found != expected:
+                        failures += 1
+                        print('mismatch: %r include_empty_lines=%s on %r: %r instead of %r' % (
+                            regexp, include_empty_lines, part, found, expected))
+
+    for _ in range(args.cases // 20):
+        old, new, expected_rows = edited_file(rng)
+        rows = diff.changed_lines(old, new)
+        if rows != expected_rows:
+            failures += 1
+            print('diff mismatch on %d lines: %r instead of %r' % (len(old), rows, expected_rows))
+
+    for regexp in ('[ \t]+$', '\\s+', '[^\\S\\n]+', '[ -~]+', ' +'):
+        if isinstance(core.compile_pattern(regexp, True), core.CharClassMatcher):
+            print('wrongly optimized: %r' % regexp)
+            failures += 1
+
+    print('%d failure%s' % (failures, '' if failures == 1 else 's'))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
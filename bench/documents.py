@@ -0,0 +1,120 @@
+'''
+Synthetic documents, cursors and edit scripts for the benchmarks.
+
+Everything is generated from a seed, so that runs are comparable.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from typing import List, NamedTuple, Tuple
+import random
+
+WORDS = ['def', 'return', 'self', 'value', 'index', 'region', 'view', 'if', 'else', 'for', 'in', 'None', '(x)', '[0]']
+SPACES = [' ', '  ', '\t', ' \t', '    ']
+
+
+# Public: The shape of a generated document.
+class Shape(NamedTuple):
+    name: str
+    lines: int
+    # the ratio of lines ending with trailing spaces
+    density: float
+    # the number of carets
+    cursors: int
+
+
+# Public: The shapes benchmarked by default, from small to large.
+SHAPES = [
+    Shape('small', 1000, 0.1, 1),
+    Shape('medium', 20000, 0.05, 4),
+    Shape('dense', 20000, 0.5, 1),
+    Shape('large', 100000, 0.02, 16),
+]
+
+
+# Public: Generates a document.
+#
+# Lines are made of words, indented or not, with some empty lines and some
+# comments (the fake syntax scopes anything after a "#" as a comment).
+#
+# shape - the shape of the document
+# seed - the seed of the generator
+#
+# Returns the text of the document.
+def document(shape: Shape, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines: List[str] = []
+    for _ in range(shape.lines):
+        roll = rng.random()
+        if roll < 0.1:
+            line = ''
+        else:
+            line = '    ' * rng.randint(0, 3) + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 10)))
+            if roll < 0.2:
+                line += '  # ' + rng.choice(WORDS)
+        if rng.random() < shape.density:
+            line += rng.choice(SPACES)
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+# Public: Picks caret positions, at the end of distinct lines.
+#
+# text - the document
+# count - the number of carets
+# seed - the seed of the generator
+#
+# Returns sorted text points.
+def cursors(text: str, count: int, seed: int = 0) -> List[int]:
+    rng = random.Random(seed)
+    ends = [i for i, char in enumerate(text) if char == '\n']
+    return sorted(rng.sample(ends, min(count, len(ends))))
+
+
+# Public: Generates an edit script: what is typed, keystroke by keystroke.
+#
+# Keystrokes are mostly characters, with some spaces (which become trailing
+# spaces for a while), new lines and deletions.
+#
+# count - the number of keystrokes
+# seed - the seed of the generator
+#
+# Returns a list of (text to insert, characters to delete before the carets)
+# pairs.
+def edit_script(count: int, seed: int = 0) -> List[Tuple[str, int]]:
+    rng = random.Random(seed)
+    script: List[Tuple[str, int]] = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            script.append(('', 1))
+        elif roll < 0.2:
+            script.append((' ', 0))
+        elif roll < 0.25:
+            script.append(('\n', 0))
+        else:
+            script.append((rng.choice('abcdefghijklmnopqrstuvwxyz'), 0))
+    return script
+
+
+# Public: Applies random line edits to a document, as if it was modified
+# since it was saved.
+#
+# text - the document
+# ratio - the ratio of lines to edit
+# seed - the seed of the generator
+#
+# Returns the modified document.
+def modified(text: str, ratio: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines = text.split('\n')
+    for _ in range(int(len(lines) * ratio)):
+        i = rng.randrange(len(lines))
+        roll = rng.random()
+        if roll < 0.6:
+            lines[i] = lines[i] + rng.choice(WORDS)
+        elif roll < 0.8:
+            lines.insert(i, rng.choice(WORDS))
+        else:
+            del lines[i]
+    return '\n'.join(lines)
@@ -0,0 +1,108 @@
+'''
+Loads the plugin against the in-memory `sublime` stand-in.
+
+The package directory is imported as the `TrailingSpaces` package, as Sublime
+Text would do, with `sublime` and `sublime_plugin` resolved to the fakes living
+next to this file.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from typing import Any, Dict, Optional
+import importlib
+import os
+import sys
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+PACKAGE_NAME = 'TrailingSpaces'
+
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+import sublime  # noqa: E402
+import sublime_plugin  # noqa: E402
+
+
+# Public: (Re)loads the plugin, with fresh fakes.
+#
+# settings - overrides of the package's default settings
+#
+# Returns the plugin module.
+def load_plugin(settings: Optional[Dict[str, Any]] = None) -> types.ModuleType:
+    for name in [name for name in sys.modules if name == PACKAGE_NAME or name.startswith(PACKAGE_NAME + '.')]:
+        plugin = sys.modules.pop(name)
+        if hasattr(plugin, 'plugin_unloaded'):
+            plugin.plugin_unloaded()
+
+    sublime.reset()
+    sublime_plugin.reset()
+    sublime.packages_dir = PACKAGE_DIR
+
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [PACKAGE_DIR]  # type: ignore
+    sys.modules[PACKAGE_NAME] = package
+    plugin = importlib.import_module(PACKAGE_NAME + '.trailing_spaces')
+
+    if settings:
+        sublime.load_settings('trailing_spaces.sublime-settings').update(settings)
+    plugin.plugin_loaded()
+    sublime_plugin.create_listeners()
+    return plugin
+
+
+# Public: Opens a new view showing text, and lets the plugin settle.
+#
+# text - the document's content
+# file_name - the path of the file the view is a view into, if any
+# settle - whether to run the pending timers
+#
+# Returns the view.
+def open_view(text: str, file_name: Optional[str] = None, settle: bool = True) -> sublime.View:
+    window = sublime.active_window()
+    view = window.new_file()
+    view.set_text(text)
+    view.set_file_name(file_name)
+    view.buffer().dirty = False
+    sublime_plugin.attach_buffer(view.buffer())
+    sublime_plugin.dispatch('on_load', view)
+    sublime_plugin.dispatch_async('on_load_async', view)
+    sublime_plugin.dispatch('on_activated', view)
+    sublime_plugin.dispatch_async('on_activated_async', view)
+    if settle:
+        sublime.run_timers(1000)
+    return view
+
+
+# Public: Closes a view the way Sublime Text does.
+def close_view(view: sublime.View) -> None:
+    sublime_plugin.dispatch('on_pre_close', view)
+    view.window().close(view)
+    sublime_plugin.dispatch('on_close', view)
+
+
+# Public: Moves the carets of a view.
+def select(view: sublime.View, *points: int) -> None:
+    view.sel().clear()
+    view.sel().add_all(sublime.Region(point) for point in points)
+    sublime_plugin.on_selection_modified(view)
+
+
+# Public: Types text at every caret of a view, as a single change per caret.
+def type_text(view: sublime.View, text: str) -> None:
+    for region in reversed(list(view.sel())):
+        view._replace(region.begin(), region.end(), text)
+    sublime_plugin.on_selection_modified(view)
+
+
+# Public: Saves a view, firing the save events.
+def save(view: sublime.View) -> None:
+    sublime_plugin.dispatch('on_pre_save', view)
+    file_name = view.file_name()
+    if file_name:
+        with open(file_name, 'w', encoding='utf-8', newline='') as f:
+            f.write(view.substr(sublime.Region(0, view.size())))
+    view.buffer().dirty = False
+    sublime_plugin.dispatch('on_post_save', view)
+    sublime_plugin.dispatch_async('on_post_save_async', view)
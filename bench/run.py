@@ -0,0 +1,213 @@
+'''
+Benchmarks of the plugin's hot paths, against the in-memory `sublime` stand-in.
+
+    python bench/run.py [--shapes small,medium] [--ops highlight,typing] [--repeat N]
+                        [--save FILE] [--compare FILE] [--threshold RATIO]
+
+Every operation runs on every document shape (see documents.py) and reports
+latency percentiles, in milliseconds, along with the peak of memory allocated
+by a single run. Results may be saved, and compared with saved ones: the exit
+status is 1 if any median got slower than the baseline's by more than the
+threshold ratio.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import documents  # noqa: E402
+import harness  # noqa: E402
+import sublime  # noqa: E402
+
+# An operation prepares its state out of the clock, then returns the function to
+# time, which is called `repeat` times.
+Operation = Callable[[documents.Shape, str, int], Callable[[int], None]]
+
+# medians within that many milliseconds of the baseline are never regressions
+NOISE_FLOOR = 0.05
+
+
+# Private: Highlighting after scrolling to random places.
+def highlight(shape: documents.Shape, text: str, repeat: int) -> Callable[[int], None]:
+    plugin = harness.load_plugin()
+    view = harness.open_view(text)
+    rng = random.Random(1)
+
+    def run(i: int) -> None:
+        start = rng.randrange(max(len(text) - 4000, 1))
+        view.set_viewport(start, start + 4000)
+        plugin.match_trailing_spaces(view)
+    return run
+
+
+# Private: Finding the trailing spaces of the whole document, from scratch.
+def full_scan(shape: documents.Shape, text: str, repeat: int) -> Callable[[int], None]:
+    plugin = harness.load_plugin()
+    view = harness.open_view(text)
+
+    def run(i: int) -> None:
+        plugin.indexes.clear()
+        plugin.scan_memos.clear()
+        plugin.find_trailing_spaces(view, scan_only_visible=False)
+    return run
+
+
+# Private: Typing with multiple carets, each keystroke being followed by the
+# highlighting update it causes.
+def typing(shape: documents.Shape, text: str, repeat: int) -> Callable[[int], None]:
+    plugin = harness.load_plugin()
+    view = harness.open_view(text)
+    harness.select(view, *documents.cursors(text, shape.cursors))
+    # the viewport watcher re-arms itself forever: only settle the scans
+    sublime.run_timers(1000)
+    script = documents.edit_script(repeat)
+    delay = plugin.settings.snapshot.debounce_delay
+
+    def run(i: int) -> None:
+        inserted, deleted = script[i]
+        if deleted:
+            for region in reversed(list(view.sel())):
+                if region.a >= deleted:
+                    view._replace(region.a - deleted, region.a, '')
+        else:
+            harness.type_text(view, inserted)
+        sublime.run_timers(delay)
+    return run
+
+
+# Private: Diffing a modified document against its saved version.
+def modified_lines(shape: documents.Shape, text: str, repeat: int) -> Callable[[int], None]:
+    plugin = harness.load_plugin()
+    old = text.splitlines()
+    new = documents.modified(text, 0.01).splitlines()
+
+    def run(i: int) -> None:
+        plugin.modified_lines_as_numbers(old, new)
+    return run
+
+
+# Private: Deleting all trailing spaces, with the default settings.
+def delete(shape: documents.Shape, text: str, repeat: int) -> Callable[[int], None]:
+    harness.load_plugin()
+    views = [harness.open_view(text) for _ in range(repeat)]
+
+    def run(i: int) -> None:
+        views[i].run_command('delete_trailing_spaces')
+    return run
+
+
+OPERATIONS: Dict[str, Operation] = {
+    'highlight': highlight,
+    'full_scan': full_scan,
+    'typing': typing,
+    'modified_lines': modified_lines,
+    'delete': delete,
+}
+
+
+# Public: Returns the nearest-rank percentile of sorted samples.
+def percentile(samples: List[float], ratio: float) -> float:
+    return samples[min(int(len(samples) * ratio), len(samples) - 1)]
+
+
+# Public: Benchmarks an operation on a document shape.
+#
+# Returns a dictionary of statistics: latency percentiles in milliseconds, and
+# the peak of memory allocated by a single run, in KiB.
+def measure(operation: Operation, shape: documents.Shape, repeat: int) -> Dict[str, float]:
+    text = documents.document(shape)
+
+    # one more run than asked for, traced
+    run = operation(shape, text, repeat + 1)
+    tracemalloc.start()
+    run(repeat)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples: List[float] = []
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        run(i)
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+
+    samples.sort()
+    return {
+        'p50': percentile(samples, 0.5),
+        'p90': percentile(samples, 0.9),
+        'p99': percentile(samples, 0.99),
+        'max': samples[-1],
+        'peak_kib': peak / 1024,
+    }
+
+
+# Public: Compares results with a baseline.
+#
+# Returns the list of (benchmark, baseline median, median) triples of
+# regressions.
+def regressions(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float
+) -> List[Tuple[str, float, float]]:
+    found = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before and stats['p50'] > before['p50'] * threshold and stats['p50'] - before['p50'] > NOISE_FLOOR:
+            found.append((name, before['p50'], stats['p50']))
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', default=','.join(shape.name for shape in documents.SHAPES))
+    parser.add_argument('--ops', default=','.join(OPERATIONS))
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--save', metavar='FILE', help='save the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with saved ones')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='the slowdown ratio of medians considered a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    shapes = {shape.name: shape for shape in documents.SHAPES}
+    results: Dict[str, Dict[str, float]] = {}
+    baseline: Dict[str, Any] = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    columns = ('benchmark', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'peak KiB', 'vs base')
+    print('%-26s %9s %9s %9s %9s %10s %8s' % columns)
+    for op in args.ops.split(','):
+        for shape_name in args.shapes.split(','):
+            name = '%s/%s' % (op, shape_name)
+            stats = measure(OPERATIONS[op], shapes[shape_name], args.repeat)
+            results[name] = stats
+
+            ratio = ''
+            if name in baseline:
+                ratio = '%.2fx' % (stats['p50'] / baseline[name]['p50'] if baseline[name]['p50'] else 0)
+            print('%-26s %9.3f %9.3f %9.3f %9.3f %10.1f %8s' % (
+                name, stats['p50'], stats['p90'], stats['p99'], stats['max'], stats['peak_kib'], ratio))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        found = regressions(results, baseline, args.threshold)
+        for name, before, after in found:
+            print('regression: %s median went from %.3f ms to %.3f ms' % (name, before, after))
+        return 1 if found else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
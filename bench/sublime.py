@@ -0,0 +1,796 @@
+'''
+In-memory stand-in for the `sublime` module.
+
+Only the parts of the API used by Trailing Spaces are implemented. Timers run
+on a virtual clock: nothing happens until `run_timers` is called.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import json
+import os
+import re
+import tempfile
+
+HIDE_ON_MINIMAP = 128
+DRAW_NO_OUTLINE = 256
+DRAW_NO_FILL = 32
+
+# the number of lines in a block of the stand-in's line index
+LINE_BLOCK_SIZE = 512
+
+_ids = itertools.count(1)
+_windows: List['Window'] = []
+_settings: Dict[str, 'Settings'] = {}
+_cache_path = tempfile.mkdtemp(prefix='trailing_spaces_cache_')
+packages_dir = ''
+status_messages: List[str] = []
+console: List[str] = []
+
+
+# -- Regions -----------------------------------------------------------------------------------------------------------
+
+class Region:
+    __slots__ = ('a', 'b', 'xpos')
+
+    def __init__(self, a: int, b: Optional[int] = None, xpos: int = -1) -> None:
+        self.a = a
+        self.b = a if b is None else b
+        self.xpos = xpos
+
+    def __repr__(self) -> str:
+        return 'Region(%d, %d)' % (self.a, self.b)
+
+    def __len__(self) -> int:
+        return self.size()
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Region) and self.a == other.a and self.b == other.b
+
+    def __lt__(self, other: 'Region') -> bool:
+        return (self.begin(), self.end()) < (other.begin(), other.end())
+
+    def __contains__(self, value: Any) -> bool:
+        return self.contains(value)
+
+    def begin(self) -> int:
+        return min(self.a, self.b)
+
+    def end(self) -> int:
+        return max(self.a, self.b)
+
+    def size(self) -> int:
+        return abs(self.b - self.a)
+
+    def empty(self) -> bool:
+        return self.a == self.b
+
+    def to_tuple(self) -> Tuple[int, int]:
+        return (self.a, self.b)
+
+    def contains(self, value: Any) -> bool:
+        if isinstance(value, Region):
+            return self.begin() <= value.begin() and value.end() <= self.end()
+        return self.begin() <= value <= self.end()
+
+    def cover(self, other: 'Region') -> 'Region':
+        return Region(min(self.begin(), other.begin()), max(self.end(), other.end()))
+
+    def intersects(self, other: 'Region') -> bool:
+        return self.begin() < other.end() and other.begin() < self.end()
+
+
+class Selection:
+    def __init__(self, view: 'View') -> None:
+        self.view = view
+        self.regions: List[Region] = [Region(0)]
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def __iter__(self):
+        return iter(list(self.regions))
+
+    def __getitem__(self, index: int) -> Region:
+        return self.regions[index]
+
+    def clear(self) -> None:
+        self.regions = []
+
+    def add(self, region: Any) -> None:
+        self.regions.append(region if isinstance(region, Region) else Region(region))
+        self.regions.sort()
+
+    def add_all(self, regions: Any) -> None:
+        for region in regions:
+            self.add(region)
+
+
+# -- Settings ----------------------------------------------------------------------------------------------------------
+
+class Settings:
+    def __init__(self, settings_id: int = 0, data: Optional[Dict[str, Any]] = None) -> None:
+        self.settings_id = settings_id
+        self._data = dict(data or {})
+        self._callbacks: Dict[str, Callable[[], None]] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def has(self, key: str) -> bool:
+        return key in self._data
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = value
+        for callback in list(self._callbacks.values()):
+            callback()
+
+    def erase(self, key: str) -> None:
+        self._data.pop(key, None)
+        for callback in list(self._callbacks.values()):
+            callback()
+
+    def update(self, values: Dict[str, Any]) -> None:
+        self._data.update(values)
+        for callback in list(self._callbacks.values()):
+            callback()
+
+    def add_on_change(self, tag: str, callback: Callable[[], None]) -> None:
+        self._callbacks[tag] = callback
+
+    def clear_on_change(self, tag: str) -> None:
+        self._callbacks.pop(tag, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self._data)
+
+
+def _load_json(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    # strip comments and trailing commas, just enough for the package's files
+    text = re.sub(r'^\s*//.*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r',(\s*[}\]])', r'\1', text)
+    return json.loads(text)
+
+
+def load_settings(name: str) -> Settings:
+    if name not in _settings:
+        path = os.path.join(packages_dir, name)
+        _settings[name] = Settings(next(_ids), _load_json(path) if os.path.isfile(path) else {})
+    return _settings[name]
+
+
+def save_settings(name: str) -> None:
+    pass
+
+
+def reset() -> None:
+    _windows.clear()
+    _settings.clear()
+    status_messages.clear()
+    console.clear()
+    clock.reset()
+
+
+# -- Timers ------------------------------------------------------------------------------------------------------------
+
+class Clock:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.now = 0.0
+        self.queue: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+
+    def schedule(self, callback: Callable[[], None], delay: float) -> None:
+        heapq.heappush(self.queue, (self.now + max(delay, 0), next(self._seq), callback))
+
+    # Runs due callbacks, advancing the virtual clock by at most `duration` ms
+    # (everything scheduled, when None). Returns the number of callbacks run.
+    def run(self, duration: Optional[float] = None, limit: int = 1000000) -> int:
+        deadline = None if duration is None else self.now + duration
+        count = 0
+        while self.queue and count < limit:
+            due = self.queue[0][0]
+            if deadline is not None and due > deadline:
+                break
+            _, _, callback = heapq.heappop(self.queue)
+            self.now = max(self.now, due)
+            callback()
+            count += 1
+        if deadline is not None:
+            self.now = max(self.now, deadline)
+        return count
+
+
+clock = Clock()
+
+
+def set_timeout(callback: Callable[[], None], delay: float = 0) -> None:
+    clock.schedule(callback, delay)
+
+
+def set_timeout_async(callback: Callable[[], None], delay: float = 0) -> None:
+    clock.schedule(callback, delay)
+
+
+def run_timers(duration: Optional[float] = None, limit: int = 1000000) -> int:
+    return clock.run(duration, limit)
+
+
+def status_message(message: str) -> None:
+    status_messages.append(message)
+
+
+def cache_path() -> str:
+    return _cache_path
+
+
+def packages_path() -> str:
+    return os.path.dirname(packages_dir)
+
+
+def version() -> str:
+    return '4180'
+
+
+def platform() -> str:
+    return 'linux'
+
+
+# -- Scopes ------------------------------------------------------------------------------------------------------------
+
+# Returns a positive score if the scope matches any of the comma separated
+# selectors, where every space separated part of a selector must prefix-match
+# a scope name, in order.
+def score_selector(scope: str, selector: str) -> int:
+    names = scope.split()
+    best = 0
+    for alternative in selector.split(','):
+        parts = alternative.split()
+        if not parts:
+            continue
+        position = 0
+        score = 0
+        for part in parts:
+            while position < len(names):
+                name = names[position]
+                position += 1
+                if name == part or name.startswith(part + '.'):
+                    score += 8 ** position
+                    break
+            else:
+                score = 0
+                break
+        best = max(best, score)
+    return best
+
+
+class Syntax:
+    def __init__(self, path: str, name: str, hidden: bool, scope: str) -> None:
+        self.path = path
+        self.name = name
+        self.hidden = hidden
+        self.scope = scope
+
+
+SYNTAXES = {
+    '.py': Syntax('Packages/Python/Python.sublime-syntax', 'Python', False, 'source.python'),
+    '.md': Syntax('Packages/Markdown/Markdown.sublime-syntax', 'Markdown', False, 'text.html.markdown'),
+    '.txt': Syntax('Packages/Text/Plain text.tmLanguage', 'Plain Text', False, 'text.plain'),
+}
+
+
+def find_syntax_for_file(path: str, first_line: str = '') -> Optional[Syntax]:
+    return SYNTAXES.get(os.path.splitext(path)[1], SYNTAXES['.txt'])
+
+
+def syntax_from_path(path: str) -> Optional[Syntax]:
+    for syntax in SYNTAXES.values():
+        if syntax.path == path:
+            return syntax
+    return None
+
+
+# -- Buffers and views -------------------------------------------------------------------------------------------------
+
+class HistoricPosition:
+    def __init__(self, pt: int, row: int, col: int) -> None:
+        self.pt = pt
+        self.row = row
+        self.col = col
+        self.col_utf16 = col
+        self.col_utf8 = col
+
+
+class TextChange:
+    def __init__(self, a: HistoricPosition, b: HistoricPosition, text: str) -> None:
+        self.a = a
+        self.b = b
+        self.str = text
+        self.len_utf16 = len(text)
+        self.len_utf8 = len(text.encode('utf-8'))
+
+
+class Edit:
+    def __init__(self, edit_token: int) -> None:
+        self.edit_token = edit_token
+
+
+# The starts of the lines of a text, by blocks of LINE_BLOCK_SIZE lines, each
+# block being shifted as a whole by edits before it: edits and lookups cost
+# about the square root of the number of lines, rather than the number of lines
+# (as they would in a plain list), so that edits weigh in the timings about as
+# little as they do in Sublime Text.
+class LineIndex:
+    def __init__(self, text: str) -> None:
+        starts = [0] + _newlines(text, 0)
+        self.count = len(starts)
+        self._blocks = [starts[i:i + LINE_BLOCK_SIZE] for i in range(0, len(starts), LINE_BLOCK_SIZE)]
+        # the shift of each block, and its first start and row once shifted
+        self._shifts = [0] * len(self._blocks)
+        self._firsts = [block[0] for block in self._blocks]
+        self._rows = list(range(0, len(starts), LINE_BLOCK_SIZE))
+
+    # Returns the position of the start of a row.
+    def start(self, row: int) -> int:
+        k = bisect_right(self._rows, row) - 1
+        return self._blocks[k][row - self._rows[k]] + self._shifts[k]
+
+    # Returns the row of a position.
+    def row(self, point: int) -> int:
+        k = max(bisect_right(self._firsts, point) - 1, 0)
+        return self._rows[k] + bisect_right(self._blocks[k], point - self._shifts[k]) - 1
+
+    # Updates the starts for the replacement of the text between a and b.
+    #
+    # Returns False if the replacement spans blocks, the index having to be
+    # built again.
+    def replace(self, a: int, b: int, text: str) -> bool:
+        row_a = self.row(a)
+        row_b = self.row(b)
+        k = bisect_right(self._rows, row_a) - 1
+        if row_b >= (self._rows[k + 1] if k + 1 < len(self._rows) else self.count):
+            return False
+
+        block = self._blocks[k]
+        shift = self._shifts[k]
+        lo = row_a - self._rows[k] + 1
+        hi = row_b - self._rows[k] + 1
+        delta = len(text) - (b - a)
+        inserted = [start - shift for start in _newlines(text, a)]
+        block[lo:] = inserted + [start + delta for start in block[hi:]]
+        lines = len(inserted) - (hi - lo)
+        self.count += lines
+        for following in range(k + 1, len(self._blocks)):
+            self._shifts[following] += delta
+            self._firsts[following] += delta
+            self._rows[following] += lines
+        return True
+
+
+# Private: Returns the positions following the newlines of a text, translated
+# by offset.
+def _newlines(text: str, offset: int) -> List[int]:
+    positions = []
+    find = text.find
+    position = find('\n')
+    while position != -1:
+        positions.append(offset + position + 1)
+        position = find('\n', position + 1)
+    return positions
+
+
+class Buffer:
+    def __init__(self) -> None:
+        self.buffer_id = next(_ids)
+        self.text = ''
+        self.change_count = 0
+        self.file = None  # type: Optional[str]
+        self.dirty = False
+        self._views: List['View'] = []
+        self.lines: Optional[LineIndex] = LineIndex('')
+
+    def id(self) -> int:
+        return self.buffer_id
+
+    def file_name(self) -> Optional[str]:
+        return self.file
+
+    def views(self) -> List['View']:
+        return list(self._views)
+
+    def primary_view(self) -> 'View':
+        return self._views[0]
+
+    def line_index(self) -> LineIndex:
+        if self.lines is None:
+            self.lines = LineIndex(self.text)
+        return self.lines
+
+
+# scope assigned to comments by the fake syntax: anything after a "#"
+COMMENT = re.compile(r'#[^\n]*')
+
+
+class View:
+    def __init__(self, window: Optional['Window'], buffer: Optional[Buffer] = None) -> None:
+        self.view_id = next(_ids)
+        self._buffer = buffer or Buffer()
+        self._buffer._views.append(self)
+        self._window = window
+        self._settings = Settings(next(_ids), {'syntax': 'Packages/Python/Python.sublime-syntax'})
+        self._sel = Selection(self)
+        self._regions: Dict[str, List[Region]] = {}
+        self._status: Dict[str, str] = {}
+        self._viewport = (0, 4000)
+        self.scratch = False
+        self.valid = True
+        self.view_encoding = 'UTF-8'
+        self.calls: Dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        return 'View(%d)' % self.view_id
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # -- identity
+
+    def id(self) -> int:
+        return self.view_id
+
+    def buffer_id(self) -> int:
+        return self._buffer.buffer_id
+
+    def buffer(self) -> Buffer:
+        return self._buffer
+
+    def clones(self) -> List['View']:
+        return [view for view in self._buffer._views if view is not self]
+
+    def is_valid(self) -> bool:
+        return self.valid
+
+    def is_primary(self) -> bool:
+        return self._buffer._views[0] is self
+
+    def window(self) -> Optional['Window']:
+        return self._window
+
+    def settings(self) -> Settings:
+        return self._settings
+
+    def syntax(self) -> Optional[Syntax]:
+        return syntax_from_path(self._settings.get('syntax', ''))
+
+    def file_name(self) -> Optional[str]:
+        return self._buffer.file
+
+    def name(self) -> str:
+        return ''
+
+    def set_file_name(self, path: Optional[str]) -> None:
+        self._buffer.file = path
+
+    def is_scratch(self) -> bool:
+        return self.scratch
+
+    def set_scratch(self, scratch: bool) -> None:
+        self.scratch = scratch
+
+    def is_dirty(self) -> bool:
+        return self._buffer.dirty
+
+    def is_loading(self) -> bool:
+        return False
+
+    def encoding(self) -> str:
+        return self.view_encoding
+
+    def change_count(self) -> int:
+        return self._buffer.change_count
+
+    def element(self) -> Optional[str]:
+        return None
+
+    # -- text
+
+    def size(self) -> int:
+        self._count('size')
+        return len(self._buffer.text)
+
+    def substr(self, x: Any) -> str:
+        self._count('substr')
+        if isinstance(x, Region):
+            return self._buffer.text[x.begin():x.end()]
+        return self._buffer.text[x:x + 1]
+
+    def text_point(self, row: int, col: int) -> int:
+        self._count('text_point')
+        lines = self._buffer.line_index()
+        if row >= lines.count:
+            return len(self._buffer.text)
+        return min(lines.start(row) + col, len(self._buffer.text))
+
+    def rowcol(self, point: int) -> Tuple[int, int]:
+        lines = self._buffer.line_index()
+        row = lines.row(point)
+        return (row, point - lines.start(row))
+
+    def line(self, x: Any) -> Region:
+        self._count('line')
+        text = self._buffer.text
+        a, b = (x.begin(), x.end()) if isinstance(x, Region) else (x, x)
+        a = min(max(a, 0), len(text))
+        b = min(max(b, 0), len(text))
+        begin = text.rfind('\n', 0, a) + 1
+        end = text.find('\n', b)
+        return Region(begin, len(text) if end == -1 else end)
+
+    def full_line(self, x: Any) -> Region:
+        line = self.line(x)
+        return Region(line.a, min(line.b + 1, len(self._buffer.text)))
+
+    def lines(self, region: Region) -> List[Region]:
+        result = []
+        line = self.line(region.begin())
+        while True:
+            result.append(line)
+            if line.b >= region.end() or line.b >= len(self._buffer.text):
+                break
+            line = self.line(line.b + 1)
+        return result
+
+    def find_all(self, pattern: str, flags: int = 0) -> List[Region]:
+        self._count('find_all')
+        return [Region(m.start(), m.end()) for m in re.finditer(pattern, self._buffer.text, re.MULTILINE)]
+
+    # -- scopes
+
+    def scope_name(self, point: int) -> str:
+        self._count('scope_name')
+        base = self.syntax().scope if self.syntax() else 'text.plain'
+        line = self.line(point)
+        hash_at = self._buffer.text.find('#', line.a, line.b)
+        if hash_at != -1 and hash_at <= point < line.b:
+            return base + ' comment.line.number-sign '
+        return base + ' '
+
+    def match_selector(self, point: int, selector: str) -> bool:
+        self._count('match_selector')
+        return score_selector(self.scope_name(point), selector) > 0
+
+    def find_by_selector(self, selector: str) -> List[Region]:
+        self._count('find_by_selector')
+        base = self.syntax().scope if self.syntax() else 'text.plain'
+        if score_selector(base, selector):
+            return [Region(0, len(self._buffer.text))] if self._buffer.text else []
+        if score_selector(base + ' comment.line.number-sign', selector):
+            return [Region(m.start(), m.end()) for m in COMMENT.finditer(self._buffer.text)]
+        return []
+
+    def extract_tokens_with_scopes(self, region: Region) -> List[Tuple[Region, str]]:
+        self._count('extract_tokens_with_scopes')
+        base = (self.syntax().scope if self.syntax() else 'text.plain') + ' '
+        tokens = []
+        position = region.begin()
+        start = self._buffer.text.rfind('\n', 0, region.begin()) + 1
+        for m in COMMENT.finditer(self._buffer.text, start, region.end()):
+            if m.end() <= position:
+                continue
+            if m.start() > position:
+                tokens.append((Region(position, m.start()), base))
+            tokens.append((Region(max(m.start(), position), m.end()), base + 'comment.line.number-sign '))
+            position = m.end()
+        if position < region.end():
+            tokens.append((Region(position, region.end()), base))
+        return tokens
+
+    # -- viewport and selection
+
+    def visible_region(self) -> Region:
+        self._count('visible_region')
+        size = len(self._buffer.text)
+        return Region(min(self._viewport[0], size), min(self._viewport[1], size))
+
+    def set_viewport(self, a: int, b: int) -> None:
+        self._viewport = (a, b)
+
+    def show(self, x: Any, show_surrounds: bool = True) -> None:
+        point = x.begin() if isinstance(x, Region) else x
+        if not self._viewport[0] <= point <= self._viewport[1]:
+            height = self._viewport[1] - self._viewport[0]
+            self._viewport = (max(point - height // 2, 0), max(point - height // 2, 0) + height)
+
+    def show_at_center(self, x: Any) -> None:
+        self.show(x)
+
+    def sel(self) -> Selection:
+        return self._sel
+
+    # -- regions and status
+
+    def add_regions(self, key: str, regions: List[Region], scope: str = '', icon: str = '', flags: int = 0) -> None:
+        self._count('add_regions')
+        self._regions[key] = [Region(r.a, r.b) for r in regions]
+
+    def get_regions(self, key: str) -> List[Region]:
+        return [Region(r.a, r.b) for r in self._regions.get(key, [])]
+
+    def erase_regions(self, key: str) -> None:
+        self._count('erase_regions')
+        self._regions.pop(key, None)
+
+    def set_status(self, key: str, value: str) -> None:
+        self._status[key] = value
+
+    def get_status(self, key: str) -> str:
+        return self._status.get(key, '')
+
+    def erase_status(self, key: str) -> None:
+        self._status.pop(key, None)
+
+    # -- edits
+
+    def run_command(self, cmd: str, args: Optional[Dict[str, Any]] = None) -> None:
+        import sublime_plugin
+        if cmd == 'append':
+            self._replace(self.size(), self.size(), (args or {}).get('characters', ''))
+            return
+        sublime_plugin.run_text_command(self, cmd, args or {})
+
+    def insert(self, edit: Edit, point: int, text: str) -> int:
+        self._replace(point, point, text)
+        return len(text)
+
+    def erase(self, edit: Edit, region: Region) -> None:
+        self._replace(region.begin(), region.end(), '')
+
+    def replace(self, edit: Edit, region: Region, text: str) -> None:
+        self._replace(region.begin(), region.end(), text)
+
+    def _replace(self, a: int, b: int, text: str) -> None:
+        import sublime_plugin
+        buffer = self._buffer
+        before = self.rowcol(a), self.rowcol(b)
+        change = TextChange(
+            HistoricPosition(a, before[0][0], before[0][1]),
+            HistoricPosition(b, before[1][0], before[1][1]),
+            text)
+        delta = len(text) - (b - a)
+        if buffer.lines is not None and not buffer.lines.replace(a, b, text):
+            # indexed again when needed
+            buffer.lines = None
+        buffer.text = buffer.text[:a] + text + buffer.text[b:]
+        buffer.change_count += 1
+        buffer.dirty = True
+
+        def shift(point: int) -> int:
+            if point <= a:
+                return point
+            return point + delta if point >= b else a + len(text)
+
+        for view in buffer._views:
+            view._sel.regions = [Region(shift(r.a), shift(r.b)) for r in view._sel.regions]
+            for key, regions in view._regions.items():
+                view._regions[key] = [Region(shift(r.a), shift(r.b)) for r in regions]
+        sublime_plugin.on_text_changed(buffer, [change])
+        for view in buffer._views:
+            sublime_plugin.on_modified(view)
+
+    # -- harness helpers
+
+    def set_text(self, text: str) -> None:
+        buffer = self._buffer
+        buffer.text = text
+        buffer.change_count += 1
+        buffer.lines = None
+        for view in buffer._views:
+            view._sel.regions = [Region(0)]
+            view._regions = {}
+
+
+class Window:
+    def __init__(self) -> None:
+        self.window_id = next(_ids)
+        self._views: List[View] = []
+        self._active: Optional[View] = None
+        self._panels: Dict[str, View] = {}
+        self._active_panel: Optional[str] = None
+        self._folders: List[str] = []
+        self._settings = Settings(next(_ids))
+        _windows.append(self)
+
+    def id(self) -> int:
+        return self.window_id
+
+    def is_valid(self) -> bool:
+        return self in _windows
+
+    def views(self) -> List[View]:
+        return list(self._views)
+
+    def new_file(self) -> View:
+        view = View(self)
+        self._views.append(view)
+        self._active = view
+        return view
+
+    def clone(self, view: View) -> View:
+        clone = View(self, view.buffer())
+        clone._settings = Settings(next(_ids), view.settings().to_dict())
+        self._views.append(clone)
+        self._active = clone
+        return clone
+
+    def focus_view(self, view: View) -> None:
+        self._active = view
+
+    def close(self, view: View) -> None:
+        self._views.remove(view)
+        view._buffer._views.remove(view)
+        view.valid = False
+        if self._active is view:
+            self._active = self._views[-1] if self._views else None
+
+    def active_view(self) -> Optional[View]:
+        return self._active
+
+    def num_groups(self) -> int:
+        return 1
+
+    def active_group(self) -> int:
+        return 0
+
+    def active_view_in_group(self, group: int) -> Optional[View]:
+        return self._active
+
+    def get_view_index(self, view: View) -> Tuple[int, int]:
+        if view in self._views:
+            return (0, self._views.index(view))
+        return (-1, -1)
+
+    def active_panel(self) -> Optional[str]:
+        return self._active_panel
+
+    def find_output_panel(self, name: str) -> Optional[View]:
+        return self._panels.get(name)
+
+    def create_output_panel(self, name: str, unlisted: bool = False) -> View:
+        if name not in self._panels:
+            self._panels[name] = View(self)
+        return self._panels[name]
+
+    def run_command(self, cmd: str, args: Optional[Dict[str, Any]] = None) -> None:
+        import sublime_plugin
+        if cmd == 'show_panel':
+            self._active_panel = (args or {}).get('panel')
+            return
+        sublime_plugin.run_window_command(self, cmd, args or {})
+
+    def status_message(self, message: str) -> None:
+        status_messages.append(message)
+
+    def folders(self) -> List[str]:
+        return list(self._folders)
+
+    def set_folders(self, folders: List[str]) -> None:
+        self._folders = folders
+
+    def settings(self) -> Settings:
+        return self._settings
+
+
+def windows() -> List[Window]:
+    return list(_windows)
+
+
+def active_window() -> Window:
+    return _windows[0] if _windows else Window()
@@ -0,0 +1,163 @@
+'''
+In-memory stand-in for the `sublime_plugin` module.
+
+Listener and command classes register themselves when defined; events are
+dispatched by the fake views and windows of the `sublime` stand-in, async
+events being queued on its virtual clock.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from typing import Any, Dict, List, Type
+import re
+import sublime
+
+_event_listener_classes: List[Type['EventListener']] = []
+_text_change_listener_classes: List[Type['TextChangeListener']] = []
+_text_commands: Dict[str, Type['TextCommand']] = {}
+_window_commands: Dict[str, Type['WindowCommand']] = {}
+_event_listeners: List['EventListener'] = []
+_text_change_listeners: Dict[int, List['TextChangeListener']] = {}
+
+
+def command_name(cls: type) -> str:
+    name = cls.__name__
+    if name.endswith('Command'):
+        name = name[:-len('Command')]
+    return re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', name).lower()
+
+
+class EventListener:
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        _event_listener_classes.append(cls)
+
+
+class TextChangeListener:
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        _text_change_listener_classes.append(cls)
+
+    def __init__(self) -> None:
+        self.buffer = None  # type: Any
+
+    @classmethod
+    def is_applicable(cls, buffer: sublime.Buffer) -> bool:
+        return False
+
+    def attach(self, buffer: sublime.Buffer) -> None:
+        self.buffer = buffer
+        _text_change_listeners.setdefault(buffer.id(), []).append(self)
+
+    def detach(self) -> None:
+        _text_change_listeners.get(self.buffer.id(), []).remove(self)
+        self.buffer = None
+
+    def is_attached(self) -> bool:
+        return self.buffer is not None
+
+
+class Command:
+    def is_enabled(self, **kwargs: Any) -> bool:
+        return True
+
+    def is_visible(self, **kwargs: Any) -> bool:
+        return True
+
+    def is_checked(self, **kwargs: Any) -> bool:
+        return False
+
+
+class ApplicationCommand(Command):
+    pass
+
+
+class WindowCommand(Command):
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        _window_commands[command_name(cls)] = cls
+
+    def __init__(self, window: sublime.Window) -> None:
+        self.window = window
+
+
+class TextCommand(Command):
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        _text_commands[command_name(cls)] = cls
+
+    def __init__(self, view: sublime.View) -> None:
+        self.view = view
+
+
+# -- Dispatching -------------------------------------------------------------------------------------------------------
+
+def reset() -> None:
+    _event_listener_classes.clear()
+    _text_change_listener_classes.clear()
+    _text_commands.clear()
+    _window_commands.clear()
+    _event_listeners.clear()
+    _text_change_listeners.clear()
+
+
+def create_listeners() -> None:
+    _event_listeners[:] = [cls() for cls in _event_listener_classes]
+
+
+def attach_buffer(buffer: sublime.Buffer) -> None:
+    if buffer.id() in _text_change_listeners:
+        return
+    _text_change_listeners[buffer.id()] = []
+    for cls in _text_change_listener_classes:
+        if cls.is_applicable(buffer):
+            cls().attach(buffer)
+
+
+def dispatch(event: str, *args: Any) -> None:
+    for listener in _event_listeners:
+        callback = getattr(listener, event, None)
+        if callback:
+            callback(*args)
+
+
+def dispatch_async(event: str, *args: Any) -> None:
+    sublime.set_timeout_async(lambda: dispatch(event, *args))
+
+
+def on_text_changed(buffer: sublime.Buffer, changes: List[sublime.TextChange]) -> None:
+    for listener in list(_text_change_listeners.get(buffer.id(), [])):
+        callback = getattr(listener, 'on_text_changed', None)
+        if callback:
+            callback(changes)
+        callback_async = getattr(listener, 'on_text_changed_async', None)
+        if callback_async:
+            sublime.set_timeout_async(lambda c=callback_async: c(changes))
+
+
+def on_modified(view: sublime.View) -> None:
+    dispatch('on_modified', view)
+    dispatch_async('on_modified_async', view)
+
+
+def on_selection_modified(view: sublime.View) -> None:
+    dispatch('on_selection_modified', view)
+    dispatch_async('on_selection_modified_async', view)
+
+
+def run_text_command(view: sublime.View, name: str, args: Dict[str, Any]) -> None:
+    cls = _text_commands.get(name)
+    if cls is None:
+        return
+    command = cls(view)
+    if command.is_enabled(**args):
+        command.run(sublime.Edit(0), **args)  # type: ignore
+
+
+def run_window_command(window: sublime.Window, name: str, args: Dict[str, Any]) -> None:
+    cls = _window_commands.get(name)
+    if cls is None:
+        return
+    command = cls(window)
+    if command.is_enabled(**args):
+        command.run(**args)  # type: ignore
@@ -0,0 +1,491 @@
+'''
+Sublime Text independent engine: finding, filtering and trimming trailing spaces
+in strings, bytes and files.
+
+Also a command-line tool to check or fix files, for use in CI or pre-commit
+hooks:
+
+    python core.py [--fix] [--regexp REGEXP] [--no-include-empty-lines] FILE...
+
+Files are memory-mapped and processed as a stream, so they are never loaded
+whole. They are expected to be in an ASCII-compatible encoding (UTF-8, Latin-1
+and the like), and may use any line endings. Binary files are skipped.
+
+Regexps which may match non-ASCII characters (say, "[ \\t\\u00a0]+" or "\\s+")
+can't be matched on bytes without splitting multibyte characters: files are
+then decoded as UTF-8 and loaded whole, bytes which are not UTF-8 being kept
+as they are.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from bisect import bisect_left, bisect_right
+from typing import (
+    Any, AnyStr, BinaryIO, ContextManager, Dict, Iterable, Iterator, List, Optional, Pattern, Sequence, Tuple, Union
+)
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+# A (begin, end) pair of text points.
+Span = Tuple[int, int]
+# What finds trailing spaces in buffers, see compile_pattern.
+Matcher = Union[Pattern[str], 'CharClassMatcher']
+# What finds trailing spaces in files, see compile_file_pattern.
+FilePattern = Union[Pattern[bytes], Pattern[str]]
+
+# the defaults of the "regexp" and "include_empty_lines" settings
+DEFAULT_REGEXP = "[ \t]+"
+DEFAULT_INCLUDE_EMPTY_LINES = True
+# files with a NUL byte within that many first bytes are binary (as git does)
+BINARY_SNIFF_SIZE = 8000
+
+
+# Public: Returns the regexp matching trailing spaces, according to settings.
+#
+# regexp - the "regexp" setting, matching spaces
+# include_empty_lines - the "include_empty_lines" setting
+# line_ending - the regexp matching the end of a line
+#
+# Returns the regexp, as a string.
+def search_regexp(regexp: str, include_empty_lines: bool, line_ending: str = "$") -> str:
+    search = regexp + line_ending
+    if not include_empty_lines:
+        search = "(?<=\\S)%s" % search
+    return search
+
+
+# Public: Returns the pattern matching trailing spaces in buffers.
+#
+# The usual patterns, made of a class of whitespace characters (such as the
+# default one), get a CharClassMatcher rather than a regexp.
+#
+# regexp - the "regexp" setting, matching spaces
+# include_empty_lines - the "include_empty_lines" setting
+#
+# Returns a compiled pattern or a CharClassMatcher, to be given to find_all.
+def compile_pattern(regexp: str, include_empty_lines: bool) -> 'Matcher':
+    chars = whitespace_class(regexp)
+    if chars:
+        return CharClassMatcher(chars, include_empty_lines)
+    return re.compile(search_regexp(regexp, include_empty_lines), re.MULTILINE)
+
+
+# Public: Returns the characters of a regexp made of a class of whitespace
+# characters, repeated, like "[ \t]+".
+#
+# regexp - the "regexp" setting
+#
+# Returns the characters, or None if the regexp is anything else.
+def whitespace_class(regexp: str) -> Optional[str]:
+    match = re.fullmatch(r"\[((?:[^\\\]]|\\.)+)\]\+", regexp, re.DOTALL)
+    if not match:
+        return None
+
+    chars = ""
+    for item in _CLASS_ITEM.findall(match.group(1)):
+        if item.startswith("\\"):
+            escaped = item[1]
+            if escaped in "xu":
+                char = chr(int(item[2:], 16))
+            else:
+                char = _ESCAPES.get(escaped, escaped)
+        else:
+            char = item
+        # no ranges, negations, newlines or anything not a space
+        if not char.isspace() or char in "\n\r":
+            return None
+        chars += char
+    return chars
+
+
+_CLASS_ITEM = re.compile(r"\\x[0-9a-fA-F]{2}|\\u[0-9a-fA-F]{4}|\\.|.", re.DOTALL)
+_ESCAPES = {"t": "\t", "f": "\f", "v": "\v", "n": "\n", "r": "\r"}
+
+
+# Public: Matches trailing spaces made of a set of whitespace characters,
+# without any regexp.
+#
+# Line ends preceded by one of the characters are looked for (str.find), and
+# the spaces before each of them are measured by stripping its line. This is
+# several times faster than the equivalent regexp, which tries to match every
+# run of spaces, and gives the same results.
+class CharClassMatcher:
+    def __init__(self, chars: str, include_empty_lines: bool) -> None:
+        self.chars = chars
+        self.include_empty_lines = include_empty_lines
+
+    # Public: Returns all spans within text that match, as find_all does.
+    def find_all(self, text: str, offset: int = 0) -> List[Span]:
+        ends: List[int] = []
+        for char in self.chars:
+            needle = char + "\n"
+            i = text.find(needle)
+            while i >= 0:
+                ends.append(i + 1)
+                i = text.find(needle, i + 2)
+        if text and text[-1] in self.chars:
+            ends.append(len(text))
+        ends.sort()
+
+        spans: List[Span] = []
+        for end in ends:
+            line_start = text.rfind("\n", 0, end) + 1
+            begin = line_start + len(text[line_start:end].rstrip(self.chars))
+            # as "(?<=\S)" would
+            if not self.include_empty_lines and (begin == line_start or text[begin - 1].isspace()):
+                continue
+            spans.append((begin + offset, end + offset))
+        return spans
+
+
+# Public: Returns the pattern matching trailing spaces in files.
+#
+# Unlike Sublime Text's buffers, files may use any line endings: carriage
+# returns are left out of the matches.
+#
+# The pattern is a bytes one if the regexp can only match ASCII characters, and
+# a str one, to be matched on decoded text, otherwise.
+#
+# regexp - the "regexp" setting, matching spaces
+# include_empty_lines - the "include_empty_lines" setting
+#
+# Returns a compiled pattern, to be given to scan_file or fix_file.
+# Raises re.error if the regexp is invalid.
+def compile_file_pattern(regexp: str, include_empty_lines: bool) -> FilePattern:
+    search = search_regexp(regexp, include_empty_lines, "(?=\r?$)")
+    if _ascii_only(regexp):
+        return re.compile(search.encode('ascii'), re.MULTILINE)
+    return re.compile(search, re.MULTILINE)
+
+
+# Private: Tells whether a regexp can only match ASCII characters, in which case
+# matching it on the bytes of any ASCII-compatible text never splits a
+# character. Anything which might match more (non-ASCII characters, escapes,
+# Unicode classes, negated classes, dots) is assumed to.
+def _ascii_only(regexp: str) -> bool:
+    chars = whitespace_class(regexp)
+    if chars is not None:
+        return chars.isascii()
+    return regexp.isascii() and not _NON_ASCII_SYNTAX.search(regexp)
+
+
+_NON_ASCII_SYNTAX = re.compile(r"\\[xuUNsSwWdD0-9]|\.|\[\^")
+
+
+# Public: Returns all spans within text that match pattern.
+#
+# pattern - the compiled pattern to search for, or a CharClassMatcher
+# text - the text to search in (a str, bytes or any bytes-like object for a bytes
+#        pattern)
+# offset - the text point the text starts at in the buffer
+#
+# Returns all matching spans, translated to buffer positions.
+def find_all(pattern: Union[Pattern[AnyStr], CharClassMatcher], text: AnyStr, offset: int = 0) -> List[Span]:
+    if isinstance(pattern, CharClassMatcher):
+        return pattern.find_all(text, offset)  # type: ignore
+    return [(m.start() + offset, m.end() + offset) for m in pattern.finditer(text)]
+
+
+# Public: Returns text without the given spans.
+#
+# text - the text to trim
+# spans - the spans to remove, sorted and not overlapping
+# offset - the text point the text starts at in the buffer
+#
+# Returns the trimmed text.
+def trim(text: AnyStr, spans: Iterable[Span], offset: int = 0) -> AnyStr:
+    kept = []
+    position = 0
+    for begin, end in spans:
+        kept.append(text[position:begin - offset])
+        position = end - offset
+    kept.append(text[position:])
+    return text[:0].join(kept)
+
+
+# Public: Sorted list of non-overlapping spans, queried by bisection.
+#
+# As spans don't overlap, both their begins and their ends are sorted, which
+# makes range queries O(log n) and filtering n spans against m others
+# O((n + m) log n).
+class IntervalIndex:
+    def __init__(self, spans: Iterable[Span] = ()) -> None:
+        self.begins: List[int] = []
+        self.ends: List[int] = []
+        for begin, end in spans:
+            self.begins.append(begin)
+            self.ends.append(end)
+
+    # Public: Returns the spans of lines, as split by str.splitlines.
+    #
+    # All line separators are expected to be one character long, as in a
+    # buffer's content.
+    #
+    # lines - the lines of text
+    #
+    # Returns an index of the lines, line separators excluded.
+    @classmethod
+    def from_lines(cls, lines: Sequence[str]) -> 'IntervalIndex':
+        index = cls()
+        begin = 0
+        for line in lines:
+            end = begin + len(line)
+            index.begins.append(begin)
+            index.ends.append(end)
+            begin = end + 1
+        return index
+
+    def __len__(self) -> int:
+        return len(self.begins)
+
+    def __iter__(self) -> Iterator[Span]:
+        return zip(self.begins, self.ends)
+
+    # Public: Returns the i-th span.
+    def span(self, i: int) -> Span:
+        return (self.begins[i], self.ends[i])
+
+    # Public: Returns the position of the entry containing a point.
+    #
+    # point - the point, which must be at or after the entry's begin and
+    #         before its end
+    #
+    # Returns the position of the entry, or -1.
+    def find(self, point: int) -> int:
+        i = bisect_right(self.begins, point) - 1
+        return i if i >= 0 and point < self.ends[i] else -1
+
+    # Public: Returns the entries lying within a span.
+    #
+    # a - the span start
+    # b - the span end
+    #
+    # Returns a list of spans.
+    def within(self, a: int, b: int) -> List[Span]:
+        lo = bisect_left(self.begins, a)
+        hi = bisect_right(self.ends, b)
+        return list(zip(self.begins[lo:hi], self.ends[lo:hi]))
+
+    # Public: Returns the entries lying within any of the given spans.
+    #
+    # spans - the spans, in any order
+    #
+    # Returns a sorted list of spans.
+    def within_any(self, spans: Iterable[Span]) -> List[Span]:
+        found: List[Span] = []
+        for lo, hi in self._slices(spans):
+            found.extend(zip(self.begins[lo:hi], self.ends[lo:hi]))
+        return found
+
+    # Public: Returns the entries lying within none of the given spans.
+    #
+    # spans - the spans, in any order
+    #
+    # Returns a sorted list of spans.
+    def outside_all(self, spans: Iterable[Span]) -> List[Span]:
+        found: List[Span] = []
+        start = 0
+        for lo, hi in self._slices(spans):
+            found.extend(zip(self.begins[start:lo], self.ends[start:lo]))
+            start = hi
+        found.extend(zip(self.begins[start:], self.ends[start:]))
+        return found
+
+    # Private: Returns the sorted, merged slices of entries lying within the
+    # given spans.
+    def _slices(self, spans: Iterable[Span]) -> List[Tuple[int, int]]:
+        slices: List[Tuple[int, int]] = []
+        for a, b in spans:
+            lo = bisect_left(self.begins, a)
+            hi = bisect_right(self.ends, b)
+            if lo < hi:
+                slices.append((lo, hi))
+
+        slices.sort()
+        merged: List[Tuple[int, int]] = []
+        for lo, hi in slices:
+            if merged and lo <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+            else:
+                merged.append((lo, hi))
+        return merged
+
+
+# Public: Finds the trailing spaces of a file, without loading it whole (unless
+# the pattern is a str one).
+#
+# path - the path of the file
+# pattern - the compiled pattern to search for, see compile_file_pattern
+#
+# Yields (line number, column, span) triples, line numbers and columns being
+# 1-based, columns in characters whatever the pattern (the file being decoded
+# as UTF-8), and spans in bytes (in characters for a str pattern).
+def scan_file(path: str, pattern: FilePattern) -> Iterator[Tuple[int, int, Span]]:
+    with open(path, 'rb') as f, _map(f) as data:
+        content = _content(data, pattern)
+        newline: Any = "\n" if isinstance(content, str) else b"\n"
+        line = 1
+        line_start = position = 0
+        for m in pattern.finditer(content):  # type: ignore
+            newlines = content[position:m.start()].count(newline)
+            if newlines:
+                line += newlines
+                line_start = content.rfind(newline, position, m.start()) + 1
+            position = m.start()
+            yield (line, _column(content[line_start:position]), m.span())
+
+
+# Public: Deletes the trailing spaces of a file, without loading it whole
+# (unless the pattern is a str one).
+#
+# The trimmed content is written to a temporary file which then replaces the
+# original one, keeping its permissions.
+#
+# path - the path of the file
+# pattern - the compiled pattern to search for, see compile_file_pattern
+#
+# Returns the number of deleted regions.
+def fix_file(path: str, pattern: FilePattern) -> int:
+    deleted = 0
+    directory = os.path.dirname(os.path.abspath(path))
+    with open(path, 'rb') as f, _map(f) as data:
+        content = _content(data, pattern)
+        spans = (m.span() for m in pattern.finditer(content))  # type: ignore
+        first = next(spans, None)
+        if first is None:
+            return 0
+
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix='.trailing_spaces-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                position = 0
+                for begin, end in itertools.chain([first], spans):
+                    out.write(_encode(content[position:begin]))
+                    position = end
+                    deleted += 1
+                out.write(_encode(content[position:]))
+            shutil.copymode(path, temporary)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    os.replace(temporary, path)
+    return deleted
+
+
+# Public: Checks whether a file looks binary.
+#
+# path - the path of the file
+#
+# Returns True or False.
+def is_binary_file(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return b"\0" in f.read(BINARY_SNIFF_SIZE)
+
+
+# Private: Returns the content of a file as a pattern matches it: decoded for a
+# str pattern, as is otherwise.
+def _content(data: Union[mmap.mmap, bytes], pattern: FilePattern) -> Union[mmap.mmap, bytes, str]:
+    if isinstance(pattern.pattern, str):
+        return bytes(data).decode('utf-8', 'surrogateescape')
+    return data
+
+
+# Private: Returns the 1-based column, in characters, following the beginning
+# of a line.
+def _column(prefix: Union[bytes, str]) -> int:
+    if isinstance(prefix, bytes) and not prefix.isascii():
+        prefix = prefix.decode('utf-8', 'surrogateescape')
+    return len(prefix) + 1
+
+
+# Private: Encodes what _content decoded back, byte for byte.
+def _encode(content: Union[bytes, str]) -> bytes:
+    return content.encode('utf-8', 'surrogateescape') if isinstance(content, str) else content
+
+
+# Private: Memory-maps an open file for reading (empty files can't be mapped).
+def _map(f: BinaryIO) -> ContextManager[Union[mmap.mmap, bytes]]:
+    if os.fstat(f.fileno()).st_size == 0:
+        return contextlib.nullcontext(b"")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Public: Checks or fixes files, as a command-line tool.
+#
+# argv - the command-line arguments, without the program name
+#
+# Returns the exit status: 1 if any trailing spaces were found (or deleted), 2
+# on errors, 0 otherwise.
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='trailing_spaces', description='Find or delete trailing spaces.')
+    parser.add_argument('files', nargs='*', metavar='FILE')
+    parser.add_argument('--files-from', metavar='LIST',
+                        help='read the files to process from LIST, one per line ("-" for stdin)')
+    parser.add_argument('--fix', action='store_true', help='delete trailing spaces instead of reporting them')
+    parser.add_argument('--json', action='store_true',
+                        help='report the number of regions of each file as JSON objects, one per line')
+    parser.add_argument('--regexp', default=DEFAULT_REGEXP,
+                        help='the regexp matching spaces (default: %(default)r)')
+    parser.add_argument('--include-empty-lines', dest='include_empty_lines', action='store_true',
+                        default=DEFAULT_INCLUDE_EMPTY_LINES, help='match spaces on empty lines (default)')
+    parser.add_argument('--no-include-empty-lines', dest='include_empty_lines', action='store_false',
+                        help='ignore spaces on empty lines')
+    args = parser.parse_args(argv)
+
+    try:
+        pattern = compile_file_pattern(args.regexp, args.include_empty_lines)
+    except re.error as e:
+        parser.error('invalid regexp %r: %s' % (args.regexp, e))
+
+    files = args.files
+    if args.files_from:
+        # lists are UTF-8 whatever the locale, as the plugin writes them
+        with (io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='surrogateescape')
+              if args.files_from == '-' else
+              open(args.files_from, encoding='utf-8', errors='surrogateescape')) as f:
+            files = files + [line.rstrip('\r\n') for line in f if line.strip()]
+    if not files:
+        parser.error('no files to process')
+    status = 0
+    for path in files:
+        report: Dict[str, Any] = {"path": path}
+        try:
+            if is_binary_file(path):
+                report["binary"] = True
+            elif args.fix:
+                report["regions"] = deleted = fix_file(path, pattern)
+                if deleted and not args.json:
+                    print("%s: deleted %d trailing spaces region%s" % (path, deleted, 's' if deleted > 1 else ''))
+            elif args.json:
+                report["regions"] = sum(1 for _ in scan_file(path, pattern))
+            else:
+                report["regions"] = 0
+                for line, column, _ in scan_file(path, pattern):
+                    print("%s:%d:%d: trailing spaces" % (path, line, column))
+                    report["regions"] += 1
+            if report.get("regions"):
+                status = max(status, 1)
+        except OSError as e:
+            report["error"] = e.strerror or str(e)
+            if not args.json:
+                print("%s: %s" % (path, report["error"]), file=sys.stderr)
+            status = 2
+
+        if args.json:
+            print(json.dumps(report), flush=True)
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
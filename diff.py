@@ -0,0 +1,224 @@
+'''
+Line diff engine, only telling which lines of the new version were inserted or
+changed.
+
+Lines are interned as integers, common prefixes and suffixes are skipped, and
+the remaining ranges are split on lines occurring exactly once on both sides
+(patience diff), recursively. Ranges without such anchors (as in files made of
+the same few lines over and over) are diffed along the shortest edit script
+(Myers' algorithm), which is cheap as long as there are few edits. Ranges
+edited too much for that are diffed by blocks of the new version the same way,
+each one from where the previous one ended in the old version, against as many
+lines of it, and looking as far ahead as the next block so that the lines
+inserted or deleted there don't lead it astray (which makes for a close
+approximation). Blocks rewritten too much for that are compared line by line
+with as many lines of the old version. This runs in near linear time on typical edits, where a
+full difflib comparison is quadratic.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from bisect import bisect_left
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+# ranges without anchors are diffed with the shortest edit script up to that
+# many steps, and by blocks of BLOCK_SIZE lines otherwise
+MAX_EDIT_COST = 1 << 18
+BLOCK_SIZE = 1 << 10
+# blocks are diffed with the shortest edit script up to that many steps
+MAX_BLOCK_EDIT_COST = 1 << 16
+
+
+# Public: Finds the lines of new which are not in old.
+#
+# old - the old version, as a sequence of lines (or of line hashes)
+# new - the new version, in the same form as old
+#
+# Returns the sorted list of the (0-based) numbers of the lines of new which
+# were inserted or changed.
+def changed_lines(old: Sequence[Hashable], new: Sequence[Hashable]) -> List[int]:
+    ids: Dict[Hashable, int] = {}
+    a = [ids.setdefault(line, len(ids)) for line in old]
+    b = [ids.setdefault(line, len(ids)) for line in new]
+
+    changed: List[int] = []
+    # ranges left to diff, processed from the top of the file downwards
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # skip the common prefix and suffix
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+
+        if blo == bhi:
+            continue
+        if alo == ahi:
+            changed.extend(range(blo, bhi))
+            continue
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            # diff the ranges between anchors, the first one on top of the stack
+            bounds = [(alo - 1, blo - 1)] + anchors + [(ahi, bhi)]
+            for (i, j), (next_i, next_j) in reversed(list(zip(bounds, bounds[1:]))):
+                stack.append((i + 1, next_i, j + 1, next_j))
+        else:
+            changed.extend(_without_anchors(a, alo, ahi, b, blo, bhi))
+
+    return changed
+
+
+# Private: Finds the longest sequence of matching lines unique to both ranges,
+# in the same order on both sides.
+#
+# Returns a list of (index in a, index in b) pairs.
+def _unique_anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    # positions of lines seen once, -1 for lines seen more than once
+    in_a: Dict[int, int] = {}
+    for i in range(alo, ahi):
+        in_a[a[i]] = -1 if a[i] in in_a else i
+    in_b: Dict[int, int] = {}
+    for j in range(blo, bhi):
+        in_b[b[j]] = -1 if b[j] in in_b else j
+
+    pairs = [
+        (i, in_b[line]) for line, i in in_a.items()
+        if i != -1 and in_b.get(line, -1) != -1
+    ]
+    if not pairs:
+        return []
+
+    # longest increasing subsequence of the positions in b, pairs being sorted
+    # by position in a (patience sorting)
+    pairs.sort()
+    tails: List[int] = []
+    tail_pairs: List[int] = []
+    previous = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pile = bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_pairs.append(k)
+        else:
+            tails[pile] = j
+            tail_pairs[pile] = k
+        previous[k] = tail_pairs[pile - 1] if pile else -1
+
+    anchors: List[Tuple[int, int]] = []
+    k = tail_pairs[-1]
+    while k != -1:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+
+# Private: Finds the lines of a range of b inserted or changed in a range of
+# a, at once or block by block.
+#
+# Returns the sorted list of their numbers.
+def _without_anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> List[int]:
+    found = _shortest_edit(a, alo, ahi, b, blo, bhi, MAX_EDIT_COST)
+    if found is not None:
+        return found[0]
+
+    changed: List[int] = []
+    i = alo
+    for j in range(blo, bhi, BLOCK_SIZE):
+        block_end = min(j + BLOCK_SIZE, bhi)
+        ahead = min(j + 2 * BLOCK_SIZE, bhi)
+        # the last block ends with the range of a, so that no line is left
+        found = _shortest_edit(a, i, ahi if ahead == bhi else min(i + ahead - j, ahi), b, j, ahead,
+                               MAX_BLOCK_EDIT_COST, block_end)
+        if found is None:
+            found = _fallback(a, i, ahi, b, j, block_end)
+        inserted, i = found
+        changed.extend(inserted)
+    return changed
+
+
+# Private: Finds the lines of a range of b inserted in a range of a, along the
+# shortest edit script (Myers' greedy algorithm).
+#
+# max_cost - the number of steps to give up after
+# cut - the line of b to stop at, the lines after only helping to find the
+#       script (bhi by default)
+#
+# Returns the sorted list of the numbers of the lines inserted before the cut
+# and the line of a the script is at there, or None if the script is too long.
+def _shortest_edit(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int,
+                   max_cost: int, cut: Optional[int] = None) -> Optional[Tuple[List[int], int]]:
+    n = ahi - alo
+    m = bhi - blo
+    # the furthest x reached on each diagonal k = x - y, and its value before
+    # each round
+    furthest = {1: 0}
+    rounds: List[Dict[int, int]] = []
+    cost = 0
+    for d in range(n + m + 1):
+        cost += d + 1
+        if cost > max_cost:
+            return None
+        rounds.append(dict(furthest))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and furthest[k - 1] < furthest[k + 1]):
+                x = furthest[k + 1]
+            else:
+                x = furthest[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            furthest[k] = x
+            if x >= n and y >= m:
+                inserted, x = _inserted(rounds, x, y, (bhi if cut is None else cut) - blo)
+                return [blo + y for y in inserted], alo + x
+    return None
+
+
+# Private: Walks the shortest edit script back from its end (x, y).
+#
+# Returns the sorted list of the lines of b inserted before the cut, and the
+# furthest line of a the script is at there, relative to the ranges.
+def _inserted(rounds: List[Dict[int, int]], x: int, y: int, cut: int) -> Tuple[List[int], int]:
+    inserted: List[int] = []
+    x_cut = None
+    for d in range(len(rounds) - 1, 0, -1):
+        furthest = rounds[d]
+        k = x - y
+        if k == -d or (k != d and furthest[k - 1] < furthest[k + 1]):
+            # down from diagonal k + 1: a line of b was inserted
+            previous_x = furthest[k + 1]
+            previous_y = previous_x - k - 1
+            if previous_y < cut:
+                inserted.append(previous_y)
+            snake_y = previous_y + 1
+        else:
+            # right from diagonal k - 1: a line of a was deleted
+            previous_x = furthest[k - 1]
+            previous_y = previous_x - k + 1
+            snake_y = previous_y
+        # the snake from the move to (x, y) crosses the cut
+        if x_cut is None and snake_y <= cut <= y:
+            x_cut = x - (y - cut)
+        x, y = previous_x, previous_y
+    if x_cut is None:
+        # on the first snake, along diagonal 0
+        x_cut = cut
+    inserted.reverse()
+    return inserted, x_cut
+
+
+# Private: Compares a range of b with as many lines of a, from a given line
+# on, line by line.
+#
+# Returns the sorted list of the numbers of the lines of b which differ, and
+# the line of a after the range.
+def _fallback(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> Tuple[List[int], int]:
+    changed = [j for j in range(blo, bhi) if alo + j - blo >= ahi or a[alo + j - blo] != b[j]]
+    return changed, min(alo + bhi - blo, ahi)
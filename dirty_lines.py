@@ -0,0 +1,85 @@
+'''
+Tracking of the lines edited since last save, from the text changes reported by
+Sublime Text, as an alternative to diffing the buffer against the disk.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List
+
+
+# Public: Sorted set of the rows of a buffer touched by an edit since it was
+# last in sync with the disk.
+#
+# Rows are remapped as lines are inserted or deleted. A row stays dirty even if
+# the edit is undone or its content was left alone by the edit (say, when
+# pressing Enter at its end): tracking is about edits, not content.
+class DirtyLines:
+    def __init__(self) -> None:
+        self.rows: List[int] = []
+        # the number of changes left to skip, and the rows to mark dirty then
+        self._skipped = 0
+        self._marked: List[int] = []
+
+    # Public: Forgets all dirty rows, the buffer being in sync with the disk.
+    def clear(self) -> None:
+        self.rows = []
+        self._skipped = 0
+        self._marked = []
+
+    # Public: Skips the next changes, and marks rows dirty instead once they
+    # are all recorded (changes may be reported after the fact). Changes which
+    # replace more lines than they actually edit, without inserting nor
+    # deleting lines (say, trimming by bulk), are tracked this way.
+    #
+    # count - the number of changes to skip
+    # rows - the rows actually edited
+    #
+    # Returns nothing.
+    def skip(self, count: int, rows: Iterable[int]) -> None:
+        self._skipped = count
+        self._marked = list(rows)
+        if not count:
+            self.mark(self._marked)
+
+    # Public: Marks rows dirty.
+    def mark(self, rows: Iterable[int]) -> None:
+        self.rows = sorted(set(self.rows).union(rows))
+
+    # Public: Records the replacement of the text between two positions.
+    #
+    # a_row, a_col - the row and column the replaced text started at
+    # b_row, b_col - the row and column the replaced text ended at
+    # text - the text inserted instead
+    #
+    # Returns nothing.
+    def record(self, a_row: int, a_col: int, b_row: int, b_col: int, text: str) -> None:
+        if self._skipped:
+            self._skipped -= 1
+            if not self._skipped:
+                self.mark(self._marked)
+                self._marked = []
+            return
+
+        inserted = text.count("\n")
+        delta = inserted - (b_row - a_row)
+        rows = self.rows
+
+        # The last line of the change is left as is when whole lines were
+        # inserted or deleted: it keeps its own state.
+        if b_col == 0 and (text.endswith("\n") or (not text and a_col == 0)):
+            last = a_row + inserted - 1
+            kept = b_row
+        else:
+            last = a_row + inserted
+            kept = -1
+
+        lo = bisect_left(rows, a_row)
+        hi = bisect_right(rows, b_row)
+        kept_dirty = lo < hi and rows[hi - 1] == kept
+
+        touched = list(range(a_row, last + 1))
+        if kept_dirty:
+            touched.append(kept + delta)
+        rows[lo:] = touched + [row + delta for row in rows[hi:]]
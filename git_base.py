@@ -0,0 +1,210 @@
+'''
+Cache of the committed version of files, as diffed in "Modified Lines Only"
+mode when modified lines are relative to git's HEAD.
+
+The HEAD commit of a repository is read from its files, which is cheap enough
+to be done on every call. git itself only runs to find the blob of a file in a
+new commit, and to read a blob never seen before: blobs are hashed once and
+kept by id, as long as the cache has room for them. As git may take a while,
+callers on the UI thread only get the version last resolved for a file.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from .project import startupinfo
+from .snapshots import hash_lines
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import os
+import shutil
+import subprocess
+
+# the time git is given to answer, in seconds
+GIT_TIMEOUT = 5
+# the number of blob ids kept, by commit and by file
+MAX_BLOB_IDS = 4096
+# the version of untracked files, shared so that it compares by identity
+EMPTY = array('q')
+
+
+# Public: The committed versions of files, as line hashes.
+class GitBaseCache:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        # work trees and their git directory, by directory of files
+        self._repositories: Dict[str, Optional[Tuple[str, str]]] = {}
+        # blob ids by (commit, path in the work tree), "" for untracked files
+        self._blob_ids: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        # blob ids last resolved, by path of the file
+        self._resolved: 'OrderedDict[str, str]' = OrderedDict()
+        self._blobs: 'OrderedDict[Tuple[str, str], array[int]]' = OrderedDict()
+        self._size = 0
+
+    # Public: Returns the version of a file in the HEAD commit of its
+    # repository.
+    #
+    # Unless resolving, git is not run: the version last resolved for the file
+    # is returned, even though HEAD may have moved since.
+    #
+    # file_name - the path of the file
+    # encoding - the Python codec to decode the file with
+    # max_size - the memory cap of the cache, in bytes
+    # resolve - whether to run git, if needed
+    #
+    # Returns the hashes of the file's committed lines (none if the file is not
+    # committed), or None if it is not in a git repository, git failed or the
+    # version is not resolved yet.
+    def get(self, file_name: str, encoding: str, max_size: int, resolve: bool = True) -> Optional['array[int]']:
+        repository = self._repository(os.path.dirname(os.path.abspath(file_name)))
+        if repository is None:
+            return None
+        work_tree, git_dir = repository
+
+        commit = _head(git_dir)
+        if commit is None:
+            # no commit yet
+            return EMPTY
+
+        path = os.path.relpath(os.path.abspath(file_name), work_tree).replace(os.sep, '/')
+        with self._lock:
+            blob_id = self._blob_ids.get((commit, path))
+            if blob_id is not None:
+                self._blob_ids.move_to_end((commit, path))
+            elif not resolve:
+                blob_id = self._resolved.get(work_tree + '/' + path)
+                if blob_id is None:
+                    return None
+        if blob_id is None:
+            blob_id = _git(work_tree, 'rev-parse', '--verify', '--quiet', '%s:%s' % (commit, path))
+            if blob_id is None:
+                return None
+            blob_id = blob_id.decode('ascii').strip()
+            with self._lock:
+                self._blob_ids[(commit, path)] = blob_id
+                if len(self._blob_ids) > MAX_BLOB_IDS:
+                    self._blob_ids.popitem(last=False)
+        if resolve:
+            with self._lock:
+                self._resolved[work_tree + '/' + path] = blob_id
+                self._resolved.move_to_end(work_tree + '/' + path)
+                if len(self._resolved) > MAX_BLOB_IDS:
+                    self._resolved.popitem(last=False)
+        if not blob_id:
+            return EMPTY
+
+        with self._lock:
+            hashes = self._blobs.get((blob_id, encoding))
+            if hashes is not None:
+                self._blobs.move_to_end((blob_id, encoding))
+                return hashes
+        if not resolve:
+            return None
+
+        content = _git(work_tree, 'cat-file', 'blob', blob_id)
+        if content is None:
+            return None
+        try:
+            hashes = hash_lines(content.decode(encoding).splitlines())
+        except (LookupError, UnicodeError):
+            return None
+
+        with self._lock:
+            self._blobs[(blob_id, encoding)] = hashes
+            self._size += len(hashes) * hashes.itemsize
+            # evict the least recently used blobs, but the one just read
+            while self._size > max_size and len(self._blobs) > 1:
+                evicted = self._blobs.pop(next(iter(self._blobs)))
+                self._size -= len(evicted) * evicted.itemsize
+        return hashes
+
+    # Public: Forgets everything.
+    def clear(self) -> None:
+        with self._lock:
+            self._repositories.clear()
+            self._blob_ids.clear()
+            self._resolved.clear()
+            self._blobs.clear()
+            self._size = 0
+
+    # Private: Returns the work tree and git directory a directory belongs
+    # to, or None.
+    def _repository(self, directory: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            if directory in self._repositories:
+                return self._repositories[directory]
+
+        repository = None
+        current = directory
+        while True:
+            dot_git = os.path.join(current, '.git')
+            if os.path.isdir(dot_git):
+                repository = (current, dot_git)
+                break
+            if os.path.isfile(dot_git):
+                # a linked work tree or a submodule
+                line = _read(dot_git)
+                if line and line.startswith('gitdir:'):
+                    repository = (current, os.path.normpath(os.path.join(current, line[7:].strip())))
+                break
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            current = parent
+
+        with self._lock:
+            self._repositories[directory] = repository
+        return repository
+
+
+# Private: Returns the id of the HEAD commit of a repository, or None if there
+# is no commit yet.
+def _head(git_dir: str) -> Optional[str]:
+    head = _read(os.path.join(git_dir, 'HEAD'))
+    if not head or not head.startswith('ref:'):
+        # detached
+        return head or None
+
+    ref = head[4:].strip()
+    # linked work trees share their refs with the main one
+    common = _read(os.path.join(git_dir, 'commondir'))
+    common_dir = os.path.normpath(os.path.join(git_dir, common)) if common else git_dir
+    for directory in (git_dir, common_dir):
+        commit = _read(os.path.join(directory, ref))
+        if commit:
+            return commit
+
+    for line in (_read(os.path.join(common_dir, 'packed-refs'), whole=True) or '').splitlines():
+        if line.endswith(' ' + ref):
+            return line.split(' ', 1)[0]
+    return None
+
+
+# Private: Returns the first line of a file (or all of it), or None if it can't
+# be read.
+def _read(path: str, whole: bool = False) -> Optional[str]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read() if whole else f.readline().strip()
+    except (OSError, UnicodeError):
+        return None
+
+
+# Private: Runs git.
+#
+# Returns its output, or None if it failed. An unknown object is no failure:
+# the output is then empty.
+def _git(work_tree: str, *args: str) -> Optional[bytes]:
+    git = shutil.which('git')
+    if not git:
+        return None
+    try:
+        process = subprocess.run(
+            [git, '-C', work_tree] + list(args), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            timeout=GIT_TIMEOUT, startupinfo=startupinfo())
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if process.returncode == 1 and not process.stdout:
+        return b''
+    return process.stdout if process.returncode == 0 else None
@@ -0,0 +1,169 @@
+'''
+Sorted indexes of text regions.
+
+The index of the trailing spaces regions of a buffer is patched with the text
+changes reported by Sublime Text, so that only the lines touched by an edit
+have to be scanned again.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from .core import IntervalIndex, Matcher, Span
+from bisect import bisect_left, bisect_right
+from threading import Lock
+from typing import List, Optional, Tuple
+
+# A (begin, end, inserted length) triple describing a text change.
+Change = Tuple[int, int, int]
+
+
+# Public: Sorted list of the trailing spaces regions of a whole buffer.
+#
+# Changes are recorded as they happen (cheap, on the UI thread) and applied
+# lazily when the index is refreshed: entries after a change are shifted, the
+# ones within the change are dropped and the touched span is remembered as
+# dirty, waiting to be scanned again by the caller.
+#
+# A partial index only knows about the `covered` spans of the buffer, which
+# are scanned bit by bit (large files); covered spans move along with changes.
+#
+# All accesses must be done while holding the `lock`.
+class TrailingSpacesIndex(IntervalIndex):
+    def __init__(self) -> None:
+        super().__init__()
+        self.lock = Lock()
+        self.dirty: List[Span] = []
+        self.pattern: Optional[Matcher] = None
+        self.built = False
+        self.change_count = -1
+        self.partial = False
+        self.covered: List[Span] = []
+        self._pending: List[Change] = []
+
+    # Public: Forgets everything so that the next refresh rebuilds the index.
+    def invalidate(self) -> None:
+        self.begins = []
+        self.ends = []
+        self.dirty = []
+        self._pending = []
+        self.built = False
+        self.change_count = -1
+        self.partial = False
+        self.covered = []
+
+    # Public: Sets the index content from a full scan of the buffer.
+    #
+    # pattern - the pattern used for the scan
+    # spans - the matching spans, sorted
+    # change_count - the buffer change count the scan was made at
+    # partial - whether the scan is yet to be done, with `cover`
+    #
+    # Returns nothing.
+    def build(self, pattern: Matcher, spans: List[Span], change_count: int, partial: bool = False) -> None:
+        self.invalidate()
+        self.pattern = pattern
+        self.begins = [begin for begin, _ in spans]
+        self.ends = [end for _, end in spans]
+        self.built = True
+        self.change_count = change_count
+        self.partial = partial
+
+    # Public: Records text changes, to be applied on next flush.
+    #
+    # Changes received before the index was built are meaningless, as the
+    # build will see them anyway.
+    #
+    # changes - the changes, in the order they were applied to the buffer
+    # change_count - the buffer change count after the changes
+    #
+    # Returns nothing.
+    def record(self, changes: List[Change], change_count: int) -> None:
+        if self.built:
+            self._pending.extend(changes)
+            self.change_count = change_count
+
+    # Public: Applies the recorded changes to the index.
+    #
+    # Returns nothing.
+    def flush(self) -> None:
+        for change in self._pending:
+            self._apply(*change)
+        self._pending = []
+
+    # Private: Shifts the index to account for the replacement of the text
+    # between a and b with length characters.
+    def _apply(self, a: int, b: int, length: int) -> None:
+        delta = length - (b - a)
+        begins, ends = self.begins, self.ends
+
+        # Entries ending within the replaced text are gone for good, the
+        # following ones move along with the text.
+        lo = bisect_left(ends, a)
+        hi = bisect_right(ends, b)
+        if hi < len(ends):
+            # The first remaining entry may start before the change (when
+            # typing within trailing spaces): it's dirty anyway.
+            first = begins[hi]
+            begins[hi] = first if first <= a else max(first + delta, a + length)
+            begins[hi + 1:] = [begin + delta for begin in begins[hi + 1:]]
+            ends[hi:] = [end + delta for end in ends[hi:]]
+        del begins[lo:hi]
+        del ends[lo:hi]
+
+        def shift(point: int) -> int:
+            if point <= a:
+                return point
+            return point + delta if point >= b else a + length
+
+        self.dirty = [(shift(begin), shift(end)) for begin, end in self.dirty]
+        self.dirty.append((a, a + length))
+        if self.partial:
+            self.covered = [(shift(begin), shift(end)) for begin, end in self.covered]
+
+    # Public: Replaces the entries ending within a span with fresh ones.
+    #
+    # a - the span start
+    # b - the span end
+    # spans - the entries found within the span, sorted
+    #
+    # Returns nothing.
+    def replace(self, a: int, b: int, spans: List[Span]) -> None:
+        lo = bisect_left(self.ends, a)
+        hi = bisect_right(self.ends, b)
+        self.begins[lo:hi] = [begin for begin, _ in spans]
+        self.ends[lo:hi] = [end for _, end in spans]
+
+    # Public: Replaces the entries of whole lines with fresh ones, and marks
+    # them as covered.
+    #
+    # a - the start of the first line
+    # b - the end of the last line
+    # spans - the entries found within the lines, sorted
+    #
+    # Returns nothing.
+    def cover(self, a: int, b: int, spans: List[Span]) -> None:
+        self.replace(a, b, spans)
+        # line endings are covered as well, so that contiguous lines merge
+        covered = sorted(self.covered + [(a, b + 1)])
+        self.covered = []
+        for begin, end in covered:
+            if self.covered and begin <= self.covered[-1][1]:
+                self.covered[-1] = (self.covered[-1][0], max(end, self.covered[-1][1]))
+            else:
+                self.covered.append((begin, end))
+
+    # Public: Returns the spans of a partial index which are not covered yet.
+    #
+    # size - the size of the buffer
+    #
+    # Returns a sorted list of spans.
+    def gaps(self, size: int) -> List[Span]:
+        gaps: List[Span] = []
+        position = 0
+        for begin, end in self.covered:
+            if begin > position:
+                gaps.append((position, min(begin, size)))
+            position = max(position, end)
+        if position < size:
+            gaps.append((position, size))
+        return [(begin, end) for begin, end in gaps if begin < end]
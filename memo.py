@@ -0,0 +1,60 @@
+'''
+Memoization of the trailing spaces found in buffers.
+
+A single edit fires several events (modification, selection, viewport poll),
+and clones of a buffer are refreshed one after the other: all of them would
+search the same unchanged text. Results are kept per buffer for its current
+change count only, so that any edit discards them at once.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from .core import Span
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+
+# Public: The trailing spaces found in a buffer, per searched region, for a
+# given change count and settings.
+class ScanMemo:
+    # the number of results kept per buffer, for as many viewports
+    MAX_ENTRIES = 8
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.change_count = -1
+        self.snapshot: Any = None
+        self._results: Dict[Optional[Span], List[Span]] = {}
+
+    # Public: Returns a result.
+    #
+    # change_count - the change count of the buffer
+    # snapshot - the settings the search depends on
+    # searched - the searched region, as a span, or None for the whole buffer
+    #
+    # Returns the spans found, not to be modified, or None if unknown.
+    def get(self, change_count: int, snapshot: Any, searched: Optional[Span]) -> Optional[List[Span]]:
+        with self.lock:
+            if change_count != self.change_count or snapshot is not self.snapshot:
+                return None
+            return self._results.get(searched)
+
+    # Public: Stores a result, dropping the ones of other change counts or
+    # settings.
+    #
+    # change_count - the change count of the buffer the spans were found at
+    # snapshot - the settings the search depends on
+    # searched - the searched region, as a span, or None for the whole buffer
+    # spans - the spans found
+    #
+    # Returns nothing.
+    def put(self, change_count: int, snapshot: Any, searched: Optional[Span], spans: List[Span]) -> None:
+        with self.lock:
+            if change_count != self.change_count or snapshot is not self.snapshot:
+                self.change_count = change_count
+                self.snapshot = snapshot
+                self._results = {}
+            elif len(self._results) >= self.MAX_ENTRIES:
+                # the oldest one goes
+                del self._results[next(iter(self._results))]
+            self._results[searched] = spans
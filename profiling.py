@@ -0,0 +1,142 @@
+'''
+Optional timing of the listener hooks and pipeline stages, per view.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from collections import deque
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, List, TypeVar, cast
+import functools
+import time
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# the number of most recent samples kept per view and stage
+WINDOW = 256
+
+
+# Private: What stage() returns while profiling is off: does nothing.
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+# Private: Times a stage and records it on exit.
+class _Stage:
+    __slots__ = ('profiler', 'view_id', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', view_id: int, name: str) -> None:
+        self.profiler = profiler
+        self.view_id = view_id
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args: Any) -> None:
+        self.profiler.record(self.view_id, self.name, (time.perf_counter() - self.start) * 1000)
+
+
+# Public: Rolling windows of the durations of stages, per view.
+#
+# The profiler is configured by the `profiling` and `profiling_slow_threshold`
+# settings, read from the snapshot returned by the given function. Stages
+# lasting longer than the threshold (in milliseconds) are logged to the console
+# as slow. While disabled, stage() costs next to nothing.
+class Profiler:
+    def __init__(self, snapshot: Callable[[], Any]) -> None:
+        self._snapshot = snapshot
+        self._lock = Lock()
+        self._samples: Dict[int, Dict[str, Deque[float]]] = {}
+        self._names: Dict[int, str] = {}
+
+    # Public: Returns a context manager timing a stage.
+    #
+    # view - the view, you know
+    # name - the name of the stage
+    #
+    # Returns the context manager.
+    def stage(self, view: Any, name: str) -> Any:
+        if not self._snapshot().profiling:
+            return _NULL_STAGE
+        view_id = view.id()
+        if view_id not in self._names:
+            self._names[view_id] = view.file_name() or view.name() or "untitled"
+        return _Stage(self, view_id, name)
+
+    # Public: Decorates a function so that its calls are timed as a stage.
+    #
+    # name - the name of the stage
+    # position - the position of the view among the function's arguments
+    #
+    # Returns the decorator.
+    def timed(self, name: str, position: int = 0) -> Callable[[F], F]:
+        def decorator(function: F) -> F:
+            @functools.wraps(function)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.stage(args[position], name):
+                    return function(*args, **kwargs)
+            return cast(F, wrapper)
+        return decorator
+
+    # Public: Records the duration of a stage.
+    #
+    # view_id - the id of the view
+    # name - the name of the stage
+    # duration - the duration, in milliseconds
+    #
+    # Returns nothing.
+    def record(self, view_id: int, name: str, duration: float) -> None:
+        with self._lock:
+            stages = self._samples.setdefault(view_id, {})
+            samples = stages.get(name)
+            if samples is None:
+                samples = stages[name] = deque(maxlen=WINDOW)
+            samples.append(duration)
+
+        if duration >= self._snapshot().profiling_slow_threshold:
+            print("Trailing Spaces: slow %s (%.1f ms) in %s" % (name, duration, self._names.get(view_id, view_id)))
+
+    # Public: Forgets the samples of a view.
+    def forget(self, view_id: int) -> None:
+        with self._lock:
+            self._samples.pop(view_id, None)
+            self._names.pop(view_id, None)
+
+    # Public: Forgets everything.
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._names.clear()
+
+    # Public: Returns the statistics of the recorded samples, as a table.
+    #
+    # Returns the table as text, with a block of lines per view.
+    def summary(self) -> str:
+        with self._lock:
+            stages_by_view = {view_id: {name: sorted(samples) for name, samples in stages.items()}
+                              for view_id, stages in self._samples.items()}
+            names = dict(self._names)
+
+        lines: List[str] = []
+        for view_id, stages in stages_by_view.items():
+            lines.append("%s (view %d)" % (names.get(view_id, "untitled"), view_id))
+            lines.append("  %-28s %6s %9s %9s %9s %9s" % ("stage", "count", "p50 ms", "p90 ms", "p99 ms", "max ms"))
+            for name, samples in sorted(stages.items()):
+                lines.append("  %-28s %6d %9.2f %9.2f %9.2f %9.2f" % (
+                    name, len(samples), _percentile(samples, 0.5), _percentile(samples, 0.9),
+                    _percentile(samples, 0.99), samples[-1]))
+        return "\n".join(lines) if lines else "No samples recorded, is profiling enabled?"
+
+
+def _percentile(samples: List[float], ratio: float) -> float:
+    return samples[min(int(len(samples) * ratio), len(samples) - 1)]
@@ -0,0 +1,203 @@
+'''
+Project-wide reporting or deletion of trailing spaces.
+
+The files of the project folders are handed over by batches to a pool of
+processes running the command-line tool (see core.py), so that the UI never
+waits, and neither does the plugin host's single async thread.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from threading import Event, Lock, Thread
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import json
+import os
+import shutil
+import subprocess
+import sublime
+import time
+
+# the number of files handed over to a process at once
+BATCH_SIZE = 200
+# the minimal delay between progress updates, in seconds
+PROGRESS_INTERVAL = 0.1
+
+
+# Public: The outcome of a project-wide job.
+class ProjectReport(NamedTuple):
+    # (path, number of regions) pairs, for files with trailing spaces
+    files: List[Tuple[str, int]]
+    # (path, error message) pairs
+    errors: List[Tuple[str, str]]
+    scanned: int
+    cancelled: bool
+
+
+# Public: Reports or deletes the trailing spaces of many files, in parallel.
+#
+# All the work happens on a background thread; callbacks are run on the main
+# thread.
+class ProjectJob:
+    # command - the command running core.py, with all options but the files
+    # paths - the files to process, listed lazily on the background thread
+    # jobs - the number of processes to run at once
+    # on_progress - called with the number of processed files and the total
+    # on_done - called with the ProjectReport
+    def __init__(
+        self, command: List[str], paths: Iterable[str], jobs: int,
+        on_progress: Callable[[int, int], None], on_done: Callable[[ProjectReport], None]
+    ) -> None:
+        self._command = command
+        self._paths: Iterable[str] = paths
+        self._total = 0
+        self._jobs = jobs
+        self._on_progress = on_progress
+        self._on_done = on_done
+        self._cancelled = Event()
+        self._lock = Lock()
+        self._processes: List[subprocess.Popen] = []
+        self._files: List[Tuple[str, int]] = []
+        self._errors: List[Tuple[str, str]] = []
+        self._scanned = 0
+        self._last_progress = 0.0
+
+    # Public: Starts the job.
+    def start(self) -> None:
+        Thread(target=self._run, daemon=True).start()
+
+    # Public: Stops the job, killing the running processes.
+    def cancel(self) -> None:
+        self._cancelled.set()
+        with self._lock:
+            for process in self._processes:
+                process.kill()
+
+    def _run(self) -> None:
+        try:
+            paths = list(self._paths)
+            self._total = len(paths)
+            batches = [paths[i:i + BATCH_SIZE] for i in range(0, len(paths), BATCH_SIZE)]
+            with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+                for _ in executor.map(self._run_batch, batches):
+                    pass
+        except OSError as e:
+            # most likely, the Python interpreter could not be run
+            self._cancelled.set()
+            self._errors.append(("(worker)", str(e)))
+
+        report = ProjectReport(
+            sorted(self._files), sorted(self._errors), self._scanned, self._cancelled.is_set())
+        sublime.set_timeout(lambda: self._on_done(report))
+
+    def _run_batch(self, batch: Sequence[str]) -> None:
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            process = subprocess.Popen(
+                self._command + ['--json', '--files-from', '-'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                encoding='utf-8', errors='surrogateescape', startupinfo=startupinfo())
+            self._processes.append(process)
+
+        try:
+            process.stdin.write("".join(path + "\n" for path in batch))
+            process.stdin.close()
+            for line in process.stdout:
+                report = json.loads(line)
+                self._record(report)
+            stderr = process.stderr.read()
+        except (OSError, ValueError) as e:
+            # killed, or garbage on the output
+            stderr = str(e)
+        finally:
+            process.wait()
+            with self._lock:
+                self._processes.remove(process)
+
+        if process.returncode not in (0, 1, 2) and not self._cancelled.is_set():
+            with self._lock:
+                self._errors.append(("(worker)", stderr.strip() or "exit status %d" % process.returncode))
+
+    def _record(self, report: dict) -> None:
+        with self._lock:
+            self._scanned += 1
+            if report.get("error"):
+                self._errors.append((report["path"], report["error"]))
+            elif report.get("regions"):
+                self._files.append((report["path"], report["regions"]))
+
+            now = time.perf_counter()
+            if now - self._last_progress < PROGRESS_INTERVAL:
+                return
+            self._last_progress = now
+            scanned = self._scanned
+
+        sublime.set_timeout(lambda: self._on_progress(scanned, self._total))
+
+
+# Public: Lists the files of folders, the way Sublime Text's sidebar does.
+#
+# folders - the folders to walk
+# folder_exclude_patterns, file_exclude_patterns - the globs of the
+#   eponymous Sublime Text settings
+# ignored - whether to skip a file, given its path
+#
+# Yields the paths of the files.
+def project_files(
+    folders: Sequence[str], folder_exclude_patterns: Sequence[str], file_exclude_patterns: Sequence[str],
+    ignored: Callable[[str], bool]
+) -> Iterator[str]:
+    for folder in folders:
+        for root, directories, files in os.walk(folder):
+            directories[:] = sorted(
+                directory for directory in directories
+                if not any(fnmatch(directory, pattern) for pattern in folder_exclude_patterns)
+            )
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                # paths are handed over one per line
+                if "\n" in path or "\r" in path:
+                    continue
+                if any(fnmatch(name, pattern) for pattern in file_exclude_patterns):
+                    continue
+                if not ignored(path):
+                    yield path
+
+
+# Public: Returns the command running the command-line tool.
+#
+# python_executable - the "python_executable" setting
+#
+# Returns the command as a list, or None if no Python interpreter was found.
+def core_command(python_executable: str) -> Optional[List[str]]:
+    python = python_executable or shutil.which("python3") or shutil.which("python")
+    if not python:
+        return None
+    return [python, _core_script()]
+
+
+# Private: Returns the path of core.py, extracting it out of the package when
+# it's zipped.
+def _core_script() -> str:
+    path = os.path.join(os.path.dirname(__file__), "core.py")
+    if os.path.isfile(path):
+        return path
+
+    content = sublime.load_resource("Packages/%s/core.py" % __package__)
+    directory = os.path.join(sublime.cache_path(), __package__)
+    path = os.path.join(directory, "core.py")
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(content)
+    return path
+
+
+# Public: Keeps console windows from popping up on Windows.
+def startupinfo() -> Optional['subprocess.STARTUPINFO']:
+    if os.name != "nt":
+        return None
+    info = subprocess.STARTUPINFO()  # type: ignore
+    info.dwFlags |= subprocess.STARTF_USESHOWWINDOW  # type: ignore
+    return info
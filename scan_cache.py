@@ -0,0 +1,176 @@
+'''
+Persistent cache of the trailing spaces found in large files, so that they are
+highlighted as soon as they are reopened, even after a restart.
+
+Every file gets an entry in the cache directory, named after a hash of its
+path. An entry is only used while the file's size and modification time are
+the ones it was stored with, and the document has the same length and is
+searched with the same regexp. The hash of the document's content it holds is
+meant to be checked afterwards, in the background.
+
+An entry is a header followed by the regions, as pairs of deltas (from the end
+of the previous region to the start of this one, and then to its end):
+
+    magic     4 bytes   b'TSC1'
+    size      int64     the size of the file, in bytes
+    mtime     int64     the modification time of the file, in nanoseconds
+    length    int64     the length of the document, in characters
+    digest    16 bytes  the hash of the document's content
+    regexp    16 bytes  the hash of the regexp the document was searched with
+    typecode  1 byte    the array typecode of the deltas, 'I' or 'q'
+    count     int64     the number of regions
+
+The least recently used entries are deleted when the cache grows bigger than
+its cap.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from .core import Span
+from array import array
+from typing import Callable, List, NamedTuple, Optional
+import hashlib
+import os
+import struct
+
+MAGIC = b'TSC1'
+HEADER = struct.Struct('<4sqqq16s16scq')
+
+
+# Public: The regions of a document found in the cache.
+class CachedScan(NamedTuple):
+    # the hash of the document's content, to check the regions against
+    digest: bytes
+    spans: List[Span]
+
+
+# Public: Hashes the content of a document the way entries do.
+#
+# text - the content of the document
+#
+# Returns the hash.
+def content_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+# Public: The trailing spaces regions of files, stored on disk.
+#
+# The directory of the cache is given by a function, so that it is only asked
+# for once needed (after the plugin is loaded).
+class ScanCache:
+    def __init__(self, directory: Callable[[], str]) -> None:
+        self._directory = directory
+
+    # Public: Returns the regions stored for a file, unless the file or the
+    # settings changed since.
+    #
+    # file_name - the path of the file
+    # regexp - the regexp the document is searched with
+    # length - the length of the document, in characters
+    #
+    # Returns the regions and the hash of the content they were found in, or
+    # None.
+    def get(self, file_name: str, regexp: str, length: int) -> Optional[CachedScan]:
+        path = self._entry(file_name)
+        try:
+            stat = os.stat(file_name)
+            with open(path, 'rb') as f:
+                header = f.read(HEADER.size)
+                if len(header) != HEADER.size:
+                    return None
+                magic, size, mtime, stored_length, digest, regexp_digest, typecode, count = HEADER.unpack(header)
+                if (magic, size, mtime, stored_length, regexp_digest) != \
+                        (MAGIC, stat.st_size, stat.st_mtime_ns, length, _regexp_digest(regexp)):
+                    return None
+                deltas = array(typecode.decode('ascii'))
+                deltas.frombytes(f.read())
+            # the entry is used: it is the most recent one now
+            os.utime(path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+        if len(deltas) != 2 * count:
+            return None
+
+        spans: List[Span] = []
+        end = 0
+        for i in range(0, len(deltas), 2):
+            begin = end + deltas[i]
+            end = begin + deltas[i + 1]
+            spans.append((begin, end))
+        return CachedScan(digest, spans)
+
+    # Public: Stores the regions of a file.
+    #
+    # file_name - the path of the file
+    # regexp - the regexp the document was searched with
+    # text - the content of the document, as on disk
+    # spans - the regions found, sorted
+    # max_size - the cap of the cache, in bytes
+    #
+    # Returns nothing.
+    def put(self, file_name: str, regexp: str, text: str, spans: List[Span], max_size: int) -> None:
+        deltas = array('q')
+        end = 0
+        for begin, span_end in spans:
+            deltas.append(begin - end)
+            deltas.append(span_end - begin)
+            end = span_end
+        # most regions are short and close to each other
+        if not deltas or 0 <= min(deltas) and max(deltas) < 1 << 32:
+            deltas = array('I', deltas)
+
+        path = self._entry(file_name)
+        try:
+            stat = os.stat(file_name)
+            header = HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns, len(text), content_digest(text),
+                                 _regexp_digest(regexp), deltas.typecode.encode('ascii'), len(spans))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written aside then moved, so that entries are never seen half written
+            temporary = '%s.%d.tmp' % (path, os.getpid())
+            with open(temporary, 'wb') as f:
+                f.write(header)
+                f.write(deltas.tobytes())
+            os.replace(temporary, path)
+        except OSError:
+            return
+
+        self._evict(max_size, path)
+
+    # Public: Deletes the entry of a file, if any.
+    def discard(self, file_name: str) -> None:
+        try:
+            os.remove(self._entry(file_name))
+        except OSError:
+            pass
+
+    # Private: Returns the path of the entry of a file.
+    def _entry(self, file_name: str) -> str:
+        name = hashlib.blake2b(os.path.normcase(os.path.abspath(file_name)).encode('utf-8', 'surrogatepass'),
+                               digest_size=16).hexdigest()
+        return os.path.join(self._directory(), name + '.bin')
+
+    # Private: Deletes the least recently used entries, but the given one, until
+    # the cache fits its cap.
+    def _evict(self, max_size: int, kept: str) -> None:
+        try:
+            entries = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                       for entry in os.scandir(os.path.dirname(kept)) if entry.name.endswith('.bin')]
+        except OSError:
+            return
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= max_size:
+                break
+            if path == kept:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+
+
+def _regexp_digest(regexp: str) -> bytes:
+    return hashlib.blake2b(regexp.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
@@ -0,0 +1,201 @@
+'''
+Scheduling of the trailing spaces scans.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from typing import Callable, Dict, Set, Tuple
+import itertools
+import time
+import sublime
+
+
+# Public: Coalesces the scan requests of each view.
+#
+# Every request supersedes the pending one of the same view and schedules a
+# scan after the debounce delay. When the delay is over, the scan only runs if
+# no newer request came in meanwhile, so a burst of events (typing, multiple
+# cursors edits) ends up in a single scan.
+class ScanScheduler:
+    def __init__(self, callback: Callable[[sublime.View], None]) -> None:
+        self._callback = callback
+        self._generations: Dict[int, int] = {}
+        self._counter = itertools.count(1)
+
+    # Public: Schedules a scan of the view, dropping the pending one if any.
+    #
+    # view - the view, you know
+    # delay - the debounce delay, in milliseconds
+    #
+    # Returns nothing.
+    def schedule(self, view: sublime.View, delay: int) -> None:
+        generation = next(self._counter)
+        self._generations[view.id()] = generation
+        sublime.set_timeout_async(lambda: self._run(view, generation), delay)
+
+    # Public: Drops the pending scan of the view, if any.
+    def cancel(self, view: sublime.View) -> None:
+        self._generations.pop(view.id(), None)
+
+    # Public: Drops all pending scans.
+    def clear(self) -> None:
+        self._generations.clear()
+
+    def _run(self, view: sublime.View, generation: int) -> None:
+        # a newer request superseded this one (or it was cancelled)
+        if self._generations.get(view.id()) != generation:
+            return
+
+        del self._generations[view.id()]
+        if view.is_valid():
+            self._callback(view)
+
+
+# Public: Watches the visible region of views, for scrolling.
+#
+# A single timer polls all the watched views in one pass. The polling interval
+# backs off while nothing scrolls and shortens as soon as something does. Views
+# which are not visible anymore are dropped, and the timer stops altogether when
+# there is nothing left to watch.
+class ViewportWatcher:
+    # the polling interval never exceeds this many times the base interval
+    MAX_BACKOFF = 4
+
+    def __init__(self, callback: Callable[[sublime.View], None]) -> None:
+        self._callback = callback
+        self._views: Dict[int, Tuple[sublime.View, sublime.Region]] = {}
+        self._base_interval = 250
+        self._interval = 0
+        self._generation = 0
+
+    # Public: Starts watching the view, (re)starting the timer at its base pace.
+    #
+    # view - the view, you know
+    # interval - the base polling interval, in milliseconds
+    #
+    # Returns nothing.
+    def watch(self, view: sublime.View, interval: int) -> None:
+        if view.id() not in self._views:
+            self._views[view.id()] = (view, view.visible_region())
+
+        # restart the timer unless it already runs at its base pace
+        if self._interval != interval or self._base_interval != interval:
+            self._base_interval = interval
+            self._schedule(interval)
+
+    # Public: Stops watching the view.
+    def unwatch(self, view: sublime.View) -> None:
+        self._views.pop(view.id(), None)
+
+    # Public: Stops watching all views.
+    def clear(self) -> None:
+        self._views.clear()
+        self._generation += 1
+        self._interval = 0
+
+    def _schedule(self, interval: int) -> None:
+        # supersede the pending tick
+        self._generation += 1
+        generation = self._generation
+        self._interval = interval
+        sublime.set_timeout_async(lambda: self._tick(generation), interval)
+
+    def _tick(self, generation: int) -> None:
+        if generation != self._generation:
+            return
+
+        visible = self._visible_view_ids()
+        scrolled = False
+        for view_id, (view, last_region) in list(self._views.items()):
+            if view_id not in visible:
+                del self._views[view_id]
+                continue
+
+            region = view.visible_region()
+            if region != last_region:
+                self._views[view_id] = (view, region)
+                self._callback(view)
+                scrolled = True
+
+        if not self._views:
+            self._interval = 0
+            return
+
+        if scrolled:
+            interval = max(self._base_interval // 2, 1)
+        else:
+            interval = min(self._interval * 2, self._base_interval * self.MAX_BACKOFF)
+        self._schedule(interval)
+
+    # Private: Returns the ids of the watched views currently visible, looking
+    # only once at each window: the active view of each group and the active
+    # output panel.
+    def _visible_view_ids(self) -> Set[int]:
+        windows: Dict[int, sublime.Window] = {}
+        for view, _ in self._views.values():
+            window = view.window()
+            if window:
+                windows[window.id()] = window
+
+        visible: Set[int] = set()
+        for window in windows.values():
+            for group in range(window.num_groups()):
+                view = window.active_view_in_group(group)
+                # won't be present if a html sheet is active
+                if view:
+                    visible.add(view.id())
+
+            active_panel = window.active_panel() or ""
+            # find_output_panel only works without the "output."" prefix
+            if active_panel.startswith("output."):
+                active_panel = active_panel[len("output."):]
+
+            panel_view = window.find_output_panel(active_panel)
+            if panel_view:
+                visible.add(panel_view.id())
+
+        return visible
+
+
+# Public: Runs a long task over the buffer of a view in time slices.
+#
+# The task is a step function doing as much work as it can until the given
+# deadline, which returns whether there is work left. Slices run on the async
+# thread, one after another, so that other events get handled in between.
+class SlicedTask:
+    def __init__(self, step: Callable[[sublime.View, float], bool]) -> None:
+        self._step = step
+        self._generations: Dict[int, int] = {}
+        self._counter = itertools.count(1)
+
+    # Public: Starts the task for the view's buffer, unless already running.
+    #
+    # view - the view, you know
+    # budget - the duration of a slice, in milliseconds
+    #
+    # Returns nothing.
+    def start(self, view: sublime.View, budget: int) -> None:
+        if view.buffer_id() in self._generations:
+            return
+
+        generation = next(self._counter)
+        self._generations[view.buffer_id()] = generation
+        sublime.set_timeout_async(lambda: self._run(view, generation, budget), 0)
+
+    # Public: Stops the task for the view's buffer, if running.
+    def cancel(self, view: sublime.View) -> None:
+        self._generations.pop(view.buffer_id(), None)
+
+    # Public: Stops all tasks.
+    def clear(self) -> None:
+        self._generations.clear()
+
+    def _run(self, view: sublime.View, generation: int, budget: int) -> None:
+        buffer_id = view.buffer_id()
+        if self._generations.get(buffer_id) != generation:
+            return
+
+        if view.is_valid() and self._step(view, time.perf_counter() + budget / 1000):
+            sublime.set_timeout_async(lambda: self._run(view, generation, budget), 0)
+        elif self._generations.get(buffer_id) == generation:
+            del self._generations[buffer_id]
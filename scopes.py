@@ -0,0 +1,137 @@
+'''
+Filtering of trailing spaces regions by scope.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from .core import IntervalIndex, Span
+from .index import Change
+from bisect import bisect_right
+from threading import Lock
+from typing import Dict, List
+import sublime
+
+
+# Public: Tells which trailing spaces regions of a buffer lie in ignored scopes.
+#
+# Rather than matching the scope of each region, the scopes of whole runs of
+# text are extracted at once (one API call for many neighbour regions) and each
+# distinct scope name is scored against the selector only once.
+#
+# Results are cached per line, keyed by the line's end (where its trailing
+# region ends). Text changes are recorded as they happen, like the index does:
+# the lines before a change keep their result, the ones it touched are dropped
+# and the ones after it are shifted. As a change may alter the scopes of all
+# the text after it (opening a comment), the first line after each change is
+# checked again, and the ones after it dropped if its result changed.
+#
+# All accesses go through the `lock`, as scans run on both the UI and the async
+# threads.
+class ScopeFilter:
+    # regions closer to each other than that many characters are classified
+    # with a single extraction of scopes
+    MAX_GAP = 2048
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.selector = ''
+        self.change_count = -1
+        self._lines: Dict[int, bool] = {}
+        self._scopes: Dict[str, bool] = {}
+        self._pending: List[Change] = []
+        # the points changed since the lines after them were last checked
+        self._changed: List[int] = []
+
+    # Public: Records text changes, to be applied on next filtering.
+    #
+    # changes - the changes, in the order they were applied to the buffer
+    # change_count - the buffer change count after the changes
+    #
+    # Returns nothing.
+    def record(self, changes: List[Change], change_count: int) -> None:
+        with self.lock:
+            if self._lines:
+                self._pending.extend(changes)
+            self.change_count = change_count
+
+    # Public: Drops the regions lying in ignored scopes.
+    #
+    # view - the view, you know
+    # spans - the trailing spaces regions, sorted
+    # selector - the selector matching ignored scopes
+    #
+    # Returns the regions not in ignored scopes.
+    def filter(self, view: sublime.View, spans: List[Span], selector: str) -> List[Span]:
+        with self.lock:
+            if selector != self.selector:
+                self.selector = selector
+                self._scopes = {}
+                self._lines = {}
+
+            for change in self._pending:
+                self._apply(*change)
+            self._pending = []
+
+            lines = self._lines
+            change_count = view.change_count()
+            if change_count != self.change_count:
+                if lines:
+                    # changes are yet to be recorded, the cache can't be used
+                    lines = {}
+                else:
+                    self.change_count = change_count
+            elif self._changed:
+                self._check(view)
+
+            unknown = [(a, b) for a, b in spans if b not in lines]
+            if unknown:
+                self._classify(view, unknown, lines)
+
+            return [(a, b) for a, b in spans if not lines[b]]
+
+    # Private: Moves the cached lines to account for the replacement of the text
+    # between a and b with length characters.
+    def _apply(self, a: int, b: int, length: int) -> None:
+        delta = length - (b - a)
+        self._lines = {end if end < a else end + delta: ignored
+                       for end, ignored in self._lines.items() if end < a or end > b}
+        self._changed = [point if point <= a else max(point + delta, a) for point in self._changed]
+        self._changed.append(a)
+
+    # Private: Checks the first cached line after each change, dropping all the
+    # ones after the change if its scope changed.
+    def _check(self, view: sublime.View) -> None:
+        ends = sorted(self._lines)
+        for point in sorted(set(self._changed)):
+            i = bisect_right(ends, point)
+            if i < len(ends) and self._ignored(view.scope_name(ends[i] - 1)) != self._lines[ends[i]]:
+                for end in ends[i:]:
+                    del self._lines[end]
+                break
+        self._changed = []
+
+    # Private: Classifies regions, grouping the neighbour ones into runs of
+    # text whose scopes are extracted at once.
+    def _classify(self, view: sublime.View, spans: List[Span], lines: Dict[int, bool]) -> None:
+        group = [spans[0]]
+        for span in spans[1:]:
+            if span[0] - group[-1][1] > self.MAX_GAP:
+                self._classify_run(view, group, lines)
+                group = []
+            group.append(span)
+        self._classify_run(view, group, lines)
+
+    def _classify_run(self, view: sublime.View, spans: List[Span], lines: Dict[int, bool]) -> None:
+        tokens = view.extract_tokens_with_scopes(sublime.Region(spans[0][0], spans[-1][1]))
+        runs = IntervalIndex((region.a, region.b) for region, _ in tokens)
+
+        for a, b in spans:
+            i = runs.find(a)
+            lines[b] = False if i == -1 else self._ignored(tokens[i][1])
+
+    # Private: Returns whether a scope name matches the selector.
+    def _ignored(self, scope: str) -> bool:
+        ignored = self._scopes.get(scope)
+        if ignored is None:
+            ignored = self._scopes[scope] = sublime.score_selector(scope, self.selector) > 0
+        return ignored
@@ -1,19 +1,197 @@
-from typing import Any, List
+from . import core
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 import sublime
 
 
+# Public: Immutable copy of the settings used on every event, along with values
+# derived from them, so that the hot path neither queries Sublime's settings
+# nor compiles patterns.
+class SettingsSnapshot(NamedTuple):
+    debounce_delay: int
+    enabled: bool
+    file_max_size: int
+    highlight_modified_lines_only: bool
+    include_current_line: bool
+    include_empty_lines: bool
+    large_file_mode: bool
+    large_file_time_budget: int
+    modified_lines_base: str
+    modified_lines_only: bool
+    modified_lines_tracking: str
+    non_visible_highlighting: int
+    profiling: bool
+    profiling_slow_threshold: int
+    scan_cache: bool
+    scan_cache_size: int
+    # the regexp matching trailing spaces, made of the "regexp" setting
+    search_regexp: str
+    # what finds search_regexp's matches in text, see core.compile_pattern
+    pattern: core.Matcher
+    # the scope_ignore setting, as a single selector
+    scope_ignore: str
+    snapshot_cache_size: int
+    status_bar_count: bool
+    syntax_ignore: Tuple[str, ...]
+    trim_on_save: bool
+    update_interval: int
+
+
+# Public: The settings of a view, resolved once until the view's settings
+# change.
+class ViewSettings(NamedTuple):
+    # the global settings with the view's overrides
+    snapshot: SettingsSnapshot
+    # the global settings they were resolved from
+    base: SettingsSnapshot
+    # whether the view's syntax is in syntax_ignore (never so for widgets)
+    ignored: bool
+
+
 class TrailingSpacesSettings:
     SETTINGS_FILENAME = 'trailing_spaces.sublime-settings'
+    ON_CHANGE_TAG = 'TrailingSpaces'
+    # the prefix of the settings overriding global ones in syntax-specific
+    # settings and view settings
+    VIEW_PREFIX = 'trailing_spaces.'
+    # the settings which may be overridden, and their types
+    OVERRIDABLE = {
+        'include_empty_lines': bool,
+        'modified_lines_only': bool,
+        'regexp': str,
+        'scope_ignore': list,
+    }
 
     def __init__(self):
         self._settings = sublime.Settings(0)
+        self._snapshot: Optional[SettingsSnapshot] = None
+        # patterns by (regexp, include_empty_lines), so that settings which
+        # search the same way share the same pattern, compared by identity
+        self._patterns: Dict[Tuple[str, bool], core.Matcher] = {}
+        self._views: Dict[int, ViewSettings] = {}
+        # the settings of the views watched for changes, by view id
+        self._watched: Dict[int, sublime.Settings] = {}
 
     def load(self) -> None:
         self._settings = sublime.load_settings(self.SETTINGS_FILENAME)
+        self._settings.add_on_change(self.ON_CHANGE_TAG, self._update_snapshot)
+        self._update_snapshot()
+
+    def unload(self) -> None:
+        self._settings.clear_on_change(self.ON_CHANGE_TAG)
+        for view_settings in self._watched.values():
+            view_settings.clear_on_change(self.ON_CHANGE_TAG)
+        self._watched.clear()
+        self._views.clear()
 
     def save(self) -> None:
         sublime.save_settings(self.SETTINGS_FILENAME)
 
+    @property
+    def snapshot(self) -> SettingsSnapshot:
+        return self._snapshot  # type: ignore
+
+    # Public: Returns the settings of a view.
+    #
+    # Global settings are overridden by the `trailing_spaces.*` settings of the
+    # view, which Sublime Text resolves from syntax-specific settings and the
+    # view's own. They are cached until the view's settings (syntax included)
+    # or the global ones change.
+    #
+    # view - the view, you know
+    #
+    # Returns the ViewSettings.
+    def for_view(self, view: sublime.View) -> ViewSettings:
+        resolved = self._views.get(view.id())
+        if resolved is not None and resolved.base is self._snapshot:
+            return resolved
+
+        view_id = view.id()
+        view_settings = view.settings()
+        if view_id not in self._watched:
+            self._watched[view_id] = view_settings
+            view_settings.add_on_change(self.ON_CHANGE_TAG, lambda: self._views.pop(view_id, None))
+
+        resolved = self._resolve(view_settings)
+        self._views[view_id] = resolved
+        return resolved
+
+    # Public: Forgets about a view, which is being closed.
+    def forget(self, view: sublime.View) -> None:
+        view_settings = self._watched.pop(view.id(), None)
+        if view_settings is not None:
+            view_settings.clear_on_change(self.ON_CHANGE_TAG)
+        self._views.pop(view.id(), None)
+
+    def _resolve(self, view_settings: sublime.Settings) -> ViewSettings:
+        base = self.snapshot
+
+        syntax = view_settings.get('syntax')
+        ignored = isinstance(syntax, str) and not view_settings.get('is_widget') and any(
+            syntax_ignore in syntax for syntax_ignore in base.syntax_ignore)
+
+        overrides = {}
+        for key, value_type in self.OVERRIDABLE.items():
+            value = view_settings.get(self.VIEW_PREFIX + key)
+            if value is None:
+                continue
+            if not isinstance(value, value_type):
+                print(f'Trailing Spaces: ignoring invalid value for setting "{self.VIEW_PREFIX}{key}". '
+                      f'Expected "{value_type}", got "{type(value)}"')
+                continue
+            overrides[key] = value
+
+        if not overrides:
+            return ViewSettings(base, base, ignored)
+
+        regexp = overrides.get('regexp', self.regexp)
+        include_empty_lines = overrides.get('include_empty_lines', base.include_empty_lines)
+        search_regexp, pattern = self._pattern(regexp, include_empty_lines)
+        snapshot = base._replace(
+            include_empty_lines=include_empty_lines,
+            modified_lines_only=overrides.get('modified_lines_only', base.modified_lines_only),
+            search_regexp=search_regexp,
+            pattern=pattern,
+            scope_ignore=",".join(overrides['scope_ignore']) if 'scope_ignore' in overrides else base.scope_ignore,
+        )
+        return ViewSettings(snapshot, base, ignored)
+
+    def _pattern(self, regexp: str, include_empty_lines: bool) -> Tuple[str, core.Matcher]:
+        pattern = self._patterns.get((regexp, include_empty_lines))
+        if pattern is None:
+            pattern = self._patterns[(regexp, include_empty_lines)] = core.compile_pattern(regexp, include_empty_lines)
+        return (core.search_regexp(regexp, include_empty_lines), pattern)
+
+    def _update_snapshot(self) -> None:
+        include_empty_lines = self.include_empty_lines
+        search_regexp, pattern = self._pattern(self.regexp, include_empty_lines)
+
+        self._snapshot = SettingsSnapshot(
+            debounce_delay=self.debounce_delay,
+            enabled=self.enabled,
+            file_max_size=self.file_max_size,
+            highlight_modified_lines_only=self.highlight_modified_lines_only,
+            include_current_line=self.include_current_line,
+            include_empty_lines=include_empty_lines,
+            large_file_mode=self.large_file_mode,
+            large_file_time_budget=self.large_file_time_budget,
+            modified_lines_base=self.modified_lines_base,
+            modified_lines_only=self.modified_lines_only,
+            modified_lines_tracking=self.modified_lines_tracking,
+            non_visible_highlighting=self.non_visible_highlighting,
+            profiling=self.profiling,
+            profiling_slow_threshold=self.profiling_slow_threshold,
+            scan_cache=self.scan_cache,
+            scan_cache_size=self.scan_cache_size,
+            search_regexp=search_regexp,
+            pattern=pattern,
+            scope_ignore=",".join(self.scope_ignore),
+            snapshot_cache_size=self.snapshot_cache_size,
+            status_bar_count=self.status_bar_count,
+            syntax_ignore=tuple(self.syntax_ignore),
+            trim_on_save=self.trim_on_save,
+            update_interval=self.update_interval,
+        )
+
     def _get(self, key: str, value_type: Any) -> Any:
         value = self._settings.get(key)
         if not isinstance(value, value_type):
@@ -27,6 +205,14 @@ class TrailingSpacesSettings:
 
     # -- Getters and setters for supported options ---------------------------------------------------------------------
 
+    @property
+    def bulk_trim_threshold(self) -> int:
+        return self._get('bulk_trim_threshold', int)
+
+    @property
+    def debounce_delay(self) -> int:
+        return self._get('debounce_delay', int)
+
     @property
     def enabled(self) -> bool:
         return self._get('enabled', bool)
@@ -35,6 +221,10 @@ class TrailingSpacesSettings:
     def file_max_size(self) -> int:
         return self._get('file_max_size', int)
 
+    @property
+    def highlight_modified_lines_only(self) -> bool:
+        return self._get('highlight_modified_lines_only', bool)
+
     @property
     def highlight_color(self) -> str:
         return self._get('highlight_color', str)
@@ -51,6 +241,18 @@ class TrailingSpacesSettings:
     def include_empty_lines(self) -> bool:
         return self._get('include_empty_lines', bool)
 
+    @property
+    def large_file_mode(self) -> bool:
+        return self._get('large_file_mode', bool)
+
+    @property
+    def large_file_time_budget(self) -> int:
+        return self._get('large_file_time_budget', int)
+
+    @property
+    def modified_lines_base(self) -> str:
+        return self._get('modified_lines_base', str)
+
     @property
     def modified_lines_only(self) -> bool:
         return self._get('modified_lines_only', bool)
@@ -59,10 +261,26 @@ class TrailingSpacesSettings:
     def modified_lines_only(self, value: bool) -> None:
         self._set('modified_lines_only', value, bool)
 
+    @property
+    def modified_lines_tracking(self) -> str:
+        return self._get('modified_lines_tracking', str)
+
     @property
     def non_visible_highlighting(self) -> int:
         return self._get('non_visible_highlighting', int)
 
+    @property
+    def profiling(self) -> bool:
+        return self._get('profiling', bool)
+
+    @property
+    def profiling_slow_threshold(self) -> int:
+        return self._get('profiling_slow_threshold', int)
+
+    @property
+    def python_executable(self) -> str:
+        return self._get('python_executable', str)
+
     @property
     def regexp(self) -> str:
         return self._get('regexp', str)
@@ -71,10 +289,26 @@ class TrailingSpacesSettings:
     def save_after_trim(self) -> bool:
         return self._get('save_after_trim', bool)
 
+    @property
+    def scan_cache(self) -> bool:
+        return self._get('scan_cache', bool)
+
+    @property
+    def scan_cache_size(self) -> int:
+        return self._get('scan_cache_size', int)
+
     @property
     def scope_ignore(self) -> List[str]:
         return self._get('scope_ignore', list)
 
+    @property
+    def snapshot_cache_size(self) -> int:
+        return self._get('snapshot_cache_size', int)
+
+    @property
+    def status_bar_count(self) -> bool:
+        return self._get('status_bar_count', bool)
+
     @property
     def syntax_ignore(self) -> List[str]:
         value = self._settings.get('syntax_ignore')
@@ -0,0 +1,101 @@
+'''
+Cache of the on-disk version of files, as diffed in "Modified Lines Only" mode.
+
+@license: MIT (http://www.opensource.org/licenses/mit-license.php)
+'''
+
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import NamedTuple, Optional
+import codecs
+import os
+
+
+# Public: The lines of a file as found on disk, stored as 64-bit hashes (the
+# diff only compares lines for equality).
+class Snapshot(NamedTuple):
+    size: int
+    mtime: int
+    encoding: str
+    hashes: 'array[int]'
+
+
+# Public: Hashes lines the way snapshots do.
+#
+# lines - the lines to hash
+#
+# Returns the array of hashes.
+def hash_lines(lines: list) -> 'array[int]':
+    return array('q', map(hash, lines))
+
+
+# Public: Snapshots of files, reused as long as the file's size and modification
+# time don't change.
+#
+# The cache holds at most max_size bytes of hashes; the least recently used
+# snapshots are evicted first.
+class SnapshotCache:
+    def __init__(self) -> None:
+        self._snapshots: 'OrderedDict[str, Snapshot]' = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    # Public: Returns the snapshot of a file, reading it only if it changed on
+    # disk since last time.
+    #
+    # file_name - the path of the file
+    # encoding - the Python codec to decode the file with
+    # max_size - the memory cap of the cache, in bytes
+    #
+    # Returns the hashes of the file's lines, or None if it can't be read.
+    def get(self, file_name: str, encoding: str, max_size: int) -> Optional['array[int]']:
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            self.discard(file_name)
+            return None
+
+        with self._lock:
+            snapshot = self._snapshots.get(file_name)
+            if snapshot and (snapshot.size, snapshot.mtime, snapshot.encoding) == \
+                    (stat.st_size, stat.st_mtime_ns, encoding):
+                self._snapshots.move_to_end(file_name)
+                return snapshot.hashes
+
+        try:
+            with codecs.open(file_name, "r", encoding) as f:
+                hashes = hash_lines(f.read().splitlines())
+        except (OSError, LookupError, UnicodeError):
+            self.discard(file_name)
+            return None
+
+        with self._lock:
+            self._pop(file_name)
+            self._snapshots[file_name] = Snapshot(stat.st_size, stat.st_mtime_ns, encoding, hashes)
+            self._size += self._sizeof(hashes)
+            # evict the least recently used snapshots, but the one just read
+            while self._size > max_size and len(self._snapshots) > 1:
+                self._pop(next(iter(self._snapshots)))
+
+        return hashes
+
+    # Public: Forgets the snapshot of a file.
+    def discard(self, file_name: str) -> None:
+        with self._lock:
+            self._pop(file_name)
+
+    # Public: Forgets all snapshots.
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+            self._size = 0
+
+    def _pop(self, file_name: str) -> None:
+        snapshot = self._snapshots.pop(file_name, None)
+        if snapshot:
+            self._size -= self._sizeof(snapshot.hashes)
+
+    @staticmethod
+    def _sizeof(hashes: 'array[int]') -> int:
+        return len(hashes) * hashes.itemsize
@@ -8,24 +8,68 @@ See README.md for details.
 @since: 2011-02-25
 '''
 
-from .settings import TrailingSpacesSettings
-from os.path import isfile
-from typing import Dict, List, Literal, Tuple, Union, cast
-import codecs
-import difflib
+from .core import IntervalIndex, Matcher, Span, compile_file_pattern, find_all, trim
+from .diff import changed_lines
+from .git_base import GitBaseCache
+from .dirty_lines import DirtyLines
+from .index import TrailingSpacesIndex
+from .memo import ScanMemo
+from .profiling import WINDOW, Profiler
+from .project import ProjectJob, ProjectReport, core_command, project_files
+from .scan_cache import CachedScan, ScanCache, content_digest
+from .scheduler import ScanScheduler, SlicedTask, ViewportWatcher
+from .scopes import ScopeFilter
+from .settings import SettingsSnapshot, TrailingSpacesSettings
+from .snapshots import SnapshotCache, hash_lines
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Hashable, Iterator, List, Literal, NamedTuple, Optional, Sequence, Tuple, Union, cast
+import os
 import re
 import sublime
+import time
 import sublime_plugin
 
-# dictionary of currently active view ids and last visible regions
-active_views: Dict[int, sublime.Region] = {}
+# dictionary of buffer ids and their index of trailing spaces regions
+indexes: Dict[int, TrailingSpacesIndex] = {}
+# dictionary of buffer ids and the trailing spaces last found in them
+scan_memos: Dict[int, ScanMemo] = {}
+# dictionary of buffer ids and their cache of ignored scopes
+scope_filters: Dict[int, ScopeFilter] = {}
+# dictionary of buffer ids and their lines edited since last save
+dirty_lines: Dict[int, DirtyLines] = {}
+# dictionary of buffer ids and the regions to delete on save, found ahead of time
+trim_plans: Dict[int, 'TrimPlan'] = {}
+# dictionary of window ids and their running project-wide job
+project_jobs: Dict[int, ProjectJob] = {}
 current_highlight_color = ''
-on_disk = None
+# dictionary of view ids and the trailing spaces regions last drawn in them
+highlights: Dict[int, 'Highlight'] = {}
+# versions of the files as found on disk, for the "Modified Lines Only" mode
+snapshots = SnapshotCache()
+# versions of the files as committed, for the "Modified Lines Only" mode
+git_bases = GitBaseCache()
+# dictionary of buffer ids and their modified lines, as found by diffing
+modified_lines: Dict[int, 'ModifiedLines'] = {}
+# dictionary of buffer ids and the number of regions on modified lines last shown
+modified_counts: Dict[int, int] = {}
+# trailing spaces regions of large files, kept across restarts
+scan_cache = ScanCache(lambda: os.path.join(sublime.cache_path(), __package__, "scans"))
 # Highlight color as defined in settings. Plugin mutates that setting when disabled so
 # that has to be stored.
 INITIAL_HIGHLIGHT_COLOR = ''
 HIGHLIGHT_REGION_KEY = 'TrailingSpacesHighlightedRegions'
+STATUS_KEY = 'trailing_spaces'
+# the maximum size of the chunks of text replaced at once when trimming by bulk
+BULK_CHUNK_SIZE = 1 << 20
+# the size of the chunks of text scanned at once in large files
+LARGE_FILE_CHUNK_SIZE = 1 << 18
+# the delay after the last edit or move at which the work only needed later on
+# (planning deletions for the next save) is done, in milliseconds
+IDLE_DELAY = 1000
 settings = TrailingSpacesSettings()
+# times the listener hooks and pipeline stages, when the profiling setting is on
+profiler = Profiler(lambda: settings.snapshot)
 
 
 def plugin_loaded() -> None:
@@ -41,42 +85,190 @@ def plugin_loaded() -> None:
         if settings.highlight_color != current_highlight_color:
             settings.save()
 
+    # start tracking the edits of the documents which are in sync with the disk
+    for window in sublime.windows():
+        for view in window.views():
+            if not view.is_dirty():
+                dirty_lines.setdefault(view.buffer_id(), DirtyLines())
+
 
 # Private: Makes sure all timers are stopped.
 #
 # Returns nothing.
 def plugin_unloaded() -> None:
-    global on_disk
+    # clear all watched views to kill all timeouts
+    watcher.clear()
+    scheduler.clear()
+    idle_scheduler.clear()
+    progressive_scan.clear()
+    for job in project_jobs.values():
+        job.cancel()
+    project_jobs.clear()
+    profiler.clear()
+    highlights.clear()
+    indexes.clear()
+    scan_memos.clear()
+    trim_plans.clear()
+    scope_filters.clear()
+    dirty_lines.clear()
+    settings.unload()
+    snapshots.clear()
+    git_bases.clear()
+    modified_lines.clear()
+    modified_counts.clear()
+
+
+# Private: Brings the index of the view's buffer up to date.
+#
+# The first call scans the whole buffer, unless it is larger than the
+# file_max_size setting: the index is then partial, and has to be covered bit
+# by bit (see cover_index), unless the regions of the file are found in the
+# scan cache. Afterwards, only the lines touched by the text changes recorded
+# since the last call are scanned again.
+#
+# view - the view, you know
+# pattern - the compiled pattern matching trailing spaces
+#
+# Returns the up-to-date index, or None if the buffer changed while it was being
+# refreshed (changes not delivered yet to the TextChangeListener).
+@profiler.timed("refresh_index")
+def refresh_index(view: sublime.View, pattern: Matcher) -> Optional[TrailingSpacesIndex]:
+    index = indexes.setdefault(view.buffer_id(), TrailingSpacesIndex())
+
+    with index.lock:
+        index.flush()
+        if index.built and index.pattern is not pattern:
+            index.invalidate()
+        built = index.built
+        change_count = index.change_count
+        dirty = index.dirty
+
+    if built and not dirty:
+        return index if view.change_count() == change_count else None
+
+    partial = False
+    cached = None
+    if not built:
+        change_count = view.change_count()
+        partial = view.size() > settings.snapshot.file_max_size
+        if partial:
+            cached = cached_scan(view, pattern)
+            partial = cached is None
+        found = cached.spans if cached else [] if partial else find_all(
+            pattern, view.substr(sublime.Region(0, view.size())))
+    else:
+        # align the dirty spans to lines and merge the overlapping ones
+        lines = sorted((view.line(sublime.Region(a, b)) for a, b in dirty), key=lambda line: line.a)
+        merged: List[sublime.Region] = []
+        for line in lines:
+            if merged and line.a <= merged[-1].b + 1:
+                merged[-1] = merged[-1].cover(line)
+            else:
+                merged.append(line)
+        rescanned = [(line, find_all(pattern, view.substr(line), line.a)) for line in merged]
+
+    with index.lock:
+        # the buffer was modified meanwhile, the scan is not trustworthy
+        if view.change_count() != change_count:
+            return None
+        if not built:
+            index.build(pattern, found, change_count, partial)
+            if cached is not None:
+                digest = cached.digest
+                sublime.set_timeout_async(lambda: check_cached_scan(view, digest, change_count), 0)
+        elif index.change_count == change_count:
+            for line, found in rescanned:
+                index.replace(line.a, line.b, found)
+            index.dirty = []
+        else:
+            return None
 
-    # clear all active views to kill all timeouts
-    active_views.clear()
-    on_disk = None
+    return index
 
 
-# Private: Returns all regions within region that match regex.
+# Private: Returns the regions of the view's file found in the scan cache, if
+# enabled and the file is unchanged since they were stored.
 #
 # view - the view, you know
-# regions - a list of regions to search
-# regex - the regex pattern to search for
+# pattern - the compiled pattern matching trailing spaces
 #
-# Returns all matching trailing regions within regions.
-def view_find_all_in_regions(view: sublime.View, regions: List[sublime.Region], regex: str) -> List[sublime.Region]:
-    found: List[sublime.Region] = []
+# Returns the regions, to be checked against the document, or None.
+def cached_scan(view: sublime.View, pattern: Matcher) -> Optional[CachedScan]:
+    snapshot = settings.for_view(view).snapshot
+    file_name = view.file_name()
+    if not snapshot.scan_cache or not file_name or view.is_dirty() or snapshot.pattern is not pattern:
+        return None
+    with profiler.stage(view, "scan_cache"):
+        return scan_cache.get(file_name, snapshot.search_regexp, view.size())
+
+
+# Private: Checks the regions found in the scan cache against the document, in
+# the background, and scans it again if they turn out to be wrong: the file
+# changed without its size nor modification time changing, or it was edited
+# before it could be checked.
+#
+# view - the view, you know
+# digest - the hash of the content the regions were found in
+# change_count - the change count the index was built at
+#
+# Returns nothing.
+def check_cached_scan(view: sublime.View, digest: bytes, change_count: int) -> None:
+    if not view.is_valid():
+        return
+    with profiler.stage(view, "scan_cache"):
+        text = view.substr(sublime.Region(0, view.size()))
+        if view.change_count() == change_count and content_digest(text) == digest:
+            return
 
-    # find all matches in the region's text
-    for region in regions:
-        text = view.substr(region)
-        # translate positions to the region's starting position
-        matches = re.finditer(regex, text, re.MULTILINE)
-        found.extend(sublime.Region(m.start() + region.begin(), m.end() + region.begin()) for m in matches)
+    if view.change_count() == change_count:
+        scan_cache.discard(cast(str, view.file_name()))
+    index = indexes.get(view.buffer_id())
+    if index is not None:
+        with index.lock:
+            index.invalidate()
+    scan_memos.pop(view.buffer_id(), None)
+    trim_plans.pop(view.buffer_id(), None)
+    # the regions drawn off the viewport can't be trusted either
+    for clone in [view] + view.clones():
+        highlights.pop(clone.id(), None)
+    scheduler.schedule(view, 0)
+
+
+# Private: Stores the regions of the view's file in the scan cache, if enabled
+# for this file and the document is in sync with the disk.
+#
+# view - the view, you know
+#
+# Returns nothing.
+def store_scan(view: sublime.View) -> None:
+    snapshot = settings.for_view(view).snapshot
+    file_name = view.file_name()
+    if not snapshot.scan_cache or not file_name or view.is_dirty() or view.size() <= snapshot.file_max_size:
+        return
 
-    return found
+    with profiler.stage(view, "scan_cache"):
+        index = refresh_index(view, snapshot.pattern)
+        if index is None:
+            return
+        change_count = view.change_count()
+        text = view.substr(sublime.Region(0, view.size()))
+        with index.lock:
+            if index.partial or index.dirty or index.change_count != change_count:
+                return
+            spans = list(index)
+        if view.change_count() == change_count:
+            scan_cache.put(file_name, snapshot.search_regexp, text, spans, snapshot.scan_cache_size)
 
 
 # Private: Get the regions matching trailing spaces.
 #
 # As the core regexp matches lines, the regions are, well, "per lines".
 #
+# When highlighting is limited to modified lines, and finding them takes a
+# diff, the lines highlighted last (as moved by edits since) stand until the
+# view is idle: diffing the whole buffer on every keystroke is way slower than
+# searching the visible region.
+#
 # view - the view, you know
 # scan_only_visible - whether to limit scanning to only visible region
 #
@@ -85,45 +277,101 @@ def view_find_all_in_regions(view: sublime.View, regions: List[sublime.Region],
 def find_trailing_spaces(
     view: sublime.View, scan_only_visible: bool = True
 ) -> Tuple[List[sublime.Region], List[sublime.Region]]:
-    include_empty_lines = settings.include_empty_lines
-    include_current_line = settings.include_current_line
-    regexp = settings.regexp + "$"
+    snapshot = settings.for_view(view).snapshot
+    trailing = search_trailing_spaces(view, snapshot, visible_lines(view, snapshot) if scan_only_visible else None)
 
-    if not include_empty_lines:
-        regexp = "(?<=\\S)%s$" % regexp
+    trailing_regions = [sublime.Region(a, b) for a, b in trailing]
+    sel = view.sel()
 
-    trailing_regions: List[sublime.Region] = []
+    highlightable = trailing
+    if snapshot.highlight_modified_lines_only and trailing:
+        lines = get_modified_lines(view, diff=False)
+        if lines is None:
+            lines = [(line.a, line.b) for line in map(view.line, view.get_regions(HIGHLIGHT_REGION_KEY))]
+        highlightable = IntervalIndex(trailing).within_any(lines)
 
-    non_visible_highlighting = settings.non_visible_highlighting
+    if snapshot.include_current_line or len(sel) == 0:
+        if highlightable is trailing:
+            return (trailing_regions, trailing_regions)
+    else:
+        selection_lines = [view.line(region.b) for region in sel]
+        # exclude the matches in the current lines from highlighting
+        highlightable = IntervalIndex(highlightable).outside_all((line.a, line.b) for line in selection_lines)
+    return (trailing_regions, [sublime.Region(a, b) for a, b in highlightable])
 
-    if scan_only_visible:
-        # find all matches in the currently visible region plus a little before and after
-        searched_region = view.visible_region()
-        searched_region.a = max(searched_region.a - non_visible_highlighting, 0)
-        searched_region.b = min(searched_region.b + non_visible_highlighting, view.size())
 
-        searched_region = view.line(searched_region)  # align to line start and end
-        trailing_regions = view_find_all_in_regions(view, [searched_region], regexp)
+# Private: Searches trailing spaces, ignored scopes excluded.
+#
+# Results are memoized per buffer and change count, so that the events fired
+# by a single edit, and the clones of a buffer, search unchanged text once.
+#
+# view - the view, you know
+# snapshot - the current settings
+# searched_region - the lines to search, or None for the whole buffer
+#
+# Returns the sorted list of spans found, not to be modified.
+def search_trailing_spaces(
+    view: sublime.View, snapshot: SettingsSnapshot, searched_region: Optional[sublime.Region]
+) -> List[Span]:
+    memo = scan_memos.setdefault(view.buffer_id(), ScanMemo())
+    change_count = view.change_count()
+    searched = None if searched_region is None else (searched_region.a, searched_region.b)
+    memoized = memo.get(change_count, snapshot, searched)
+    if memoized is not None:
+        return memoized
+
+    pattern = snapshot.pattern
+    trailing: List[Span] = []
+
+    index = refresh_index(view, pattern)
+
+    if searched_region is not None:
+        if index is not None and cover_index(view, index, pattern, searched_region.a, searched_region.b):
+            with index.lock:
+                trailing = index.within(searched_region.a, searched_region.b)
+        else:
+            trailing = find_all(pattern, view.substr(searched_region), searched_region.a)
+    elif index is not None and cover_index(view, index, pattern, 0, view.size()):
+        with index.lock:
+            trailing = list(index)
     else:
-        trailing_regions = view.find_all(regexp)
+        trailing = find_all(pattern, view.substr(sublime.Region(0, view.size())))
 
-    ignored_scopes = ",".join(settings.scope_ignore)
-    # filter out ignored scopes
-    trailing_regions = [
-        region for region in trailing_regions
-        if not ignored_scopes or not view.match_selector(region.begin(), ignored_scopes)
-    ]
+    trailing = filter_scopes(view, snapshot, trailing)
 
-    sel = view.sel()
+    # the buffer may have changed meanwhile
+    if view.change_count() == change_count:
+        memo.put(change_count, snapshot, searched, trailing)
+    return trailing
 
-    if include_current_line or len(sel) == 0:
-        return (trailing_regions, trailing_regions)
-    else:
-        selection_lines = [view.line(region.b) for region in sel]
-        # find all matches in the current line and exclude them from highlighting
-        selection_offenders = view_find_all_in_regions(view, selection_lines, regexp)
-        highlightable = [r for r in trailing_regions if r not in selection_offenders]
-        return (trailing_regions, highlightable)
+
+# Private: Filters out the regions lying in ignored scopes.
+#
+# view - the view, you know
+# snapshot - the current settings
+# spans - the regions, sorted
+#
+# Returns the regions which are not ignored.
+def filter_scopes(view: sublime.View, snapshot: SettingsSnapshot, spans: List[Span]) -> List[Span]:
+    if not snapshot.scope_ignore or not spans:
+        return spans
+    scope_filter = scope_filters.setdefault(view.buffer_id(), ScopeFilter())
+    with profiler.stage(view, "scope_filter"):
+        return scope_filter.filter(view, spans, snapshot.scope_ignore)
+
+
+# Private: Returns the lines scanned for trailing spaces to highlight: the
+# currently visible region plus a little before and after.
+#
+# view - the view, you know
+# snapshot - the current settings
+#
+# Returns the region, aligned to line start and end.
+def visible_lines(view: sublime.View, snapshot: SettingsSnapshot) -> sublime.Region:
+    region = view.visible_region()
+    region.a = max(region.a - snapshot.non_visible_highlighting, 0)
+    region.b = min(region.b + snapshot.non_visible_highlighting, view.size())
+    return view.line(region)
 
 
 # Private: Find the freaking trailing spaces in the view and flags them as such!
@@ -135,6 +383,7 @@ def find_trailing_spaces(
 # view - the view, you know
 #
 # Returns nothing.
+@profiler.timed("match_trailing_spaces")
 def match_trailing_spaces(view: sublime.View) -> None:
     # Silently pass ignored views.
     if ignore_view(view):
@@ -144,53 +393,328 @@ def match_trailing_spaces(view: sublime.View) -> None:
     if max_size_exceeded(view):
         return
 
+    snapshot = settings.for_view(view).snapshot
+    if snapshot.highlight_modified_lines_only and snapshot.modified_lines_base == "git":
+        # HEAD may have moved
+        base_version(view, snapshot, resolve=True)
+
     (matched, highlightable) = find_trailing_spaces(view)
-    highlight_trailing_spaces_regions(view, highlightable)
+    highlight_trailing_spaces_regions(view, highlightable, visible_lines(view, settings.snapshot))
+    update_status(view)
+
+    # scan the rest of large files in the background
+    index = indexes.get(view.buffer_id())
+    if index is not None and index.partial:
+        progressive_scan.start(view, settings.snapshot.large_file_time_budget)
+    # otherwise, get ready for the next save (and for HEAD to move), once edits
+    # are over
+    elif settings.snapshot.trim_on_save or snapshot.modified_lines_base == "git":
+        idle_scheduler.schedule(view, IDLE_DELAY)
+    if snapshot.highlight_modified_lines_only and get_modified_lines(view, diff=False) is None:
+        idle_scheduler.schedule(view, IDLE_DELAY)
+
+
+# Private: Does the work left for when the view is idle: resolving the git
+# base, planning the deletion of the next save, and highlighting and counting
+# the regions on modified lines.
+#
+# view - the view, you know
+#
+# Returns nothing.
+def on_idle(view: sublime.View) -> None:
+    if ignore_view(view) or max_size_exceeded(view):
+        return
 
+    snapshot = settings.for_view(view).snapshot
+    if snapshot.modified_lines_base == "git":
+        base_version(view, snapshot, resolve=True)
 
-# Private: Checks if the view should be ignored.
+    index = indexes.get(view.buffer_id())
+    if settings.snapshot.trim_on_save and index is not None and not index.partial:
+        get_trim_plan(view)
+    if snapshot.enabled and snapshot.highlight_modified_lines_only and get_modified_lines(view, diff=False) is None:
+        get_modified_lines(view)
+        (matched, highlightable) = find_trailing_spaces(view)
+        highlight_trailing_spaces_regions(view, highlightable, visible_lines(view, snapshot))
+    if snapshot.status_bar_count:
+        update_status(view, idle=True)
+
+
+# Private: Shows the number of trailing spaces regions in the status bar, if
+# enabled.
 #
-# view - the view to check.
+# The count comes from the index of the buffer, which is kept up to date as
+# text changes, so nothing is searched, and regions in ignored scopes are left
+# out. The count of a partial index (large files) is a lower bound. The count
+# of regions on modified lines is the one "Modified Lines Only" deletions go
+# by: when finding modified lines takes a diff, it is only updated once the
+# view is idle.
 #
-# Returns True if the view should be ignored, False otherwise.
-def ignore_view(view: sublime.View) -> bool:
-    if view.is_scratch():
-        return True
+# view - the view, you know
+# idle - whether the view is idle, so that modified lines may be diffed
+#
+# Returns nothing.
+@profiler.timed("update_status")
+def update_status(view: sublime.View, idle: bool = False) -> None:
+    snapshot = settings.for_view(view).snapshot
+    index = indexes.get(view.buffer_id())
+    if not snapshot.status_bar_count or index is None:
+        if view.get_status(STATUS_KEY):
+            view.erase_status(STATUS_KEY)
+        return
+
+    with index.lock:
+        index.flush()
+        # the index is behind the buffer, a scan will follow
+        if not index.built or index.dirty or index.change_count != view.change_count():
+            return
+        change_count = index.change_count
+        spans = list(index)
+        partial = index.partial
+    spans = filter_scopes(view, snapshot, spans)
+
+    modified = None
+    # large files are not diffed, as for deletions
+    lines = get_modified_lines(view, diff=idle and not partial)
+    if lines is not None:
+        modified = len(IntervalIndex(spans).within_any(lines)) if spans and lines else 0
+        if view.change_count() == change_count:
+            modified_counts[view.buffer_id()] = modified
+    else:
+        # until the view is idle, the last count stands
+        modified = modified_counts.get(view.buffer_id())
+        if modified is not None:
+            modified = min(modified, len(spans))
+        if not partial:
+            idle_scheduler.schedule(view, IDLE_DELAY)
+
+    status = ""
+    if spans:
+        status = "Trailing spaces: %d%s" % (len(spans), "+" if partial else "")
+        if modified is not None:
+            status += " (%d%s modified)" % (modified, "+" if partial else "")
+    if view.get_status(STATUS_KEY) != status:
+        view.set_status(STATUS_KEY, status)
+
+
+# Private: Schedules a new scan of a view which visible region changed.
+#
+# view - the view, you know
+#
+# Returns nothing.
+def on_visible_region_changed(view: sublime.View) -> None:
+    if settings.snapshot.enabled:
+        scheduler.schedule(view, 0)
 
-    view_settings = view.settings()
-    view_syntax = view_settings.get('syntax')
 
-    if not isinstance(view_syntax, str) or view_settings.get('is_widget'):
+# Private: Makes sure the lines between two points are covered by a partial
+# index, scanning the ones which are not yet.
+#
+# view - the view, you know
+# index - the index of the view's buffer
+# pattern - the compiled pattern matching trailing spaces
+# a - the start of the first line
+# b - the end of the last line
+#
+# Returns whether the lines are covered, which is not the case if the buffer
+# changed while they were being scanned.
+def cover_index(view: sublime.View, index: TrailingSpacesIndex, pattern: Matcher, a: int, b: int) -> bool:
+    with index.lock:
+        if not index.partial:
+            return True
+        index.flush()
+        change_count = index.change_count
+        gaps = [(max(begin, a), min(end, b)) for begin, end in index.gaps(view.size()) if begin <= b and end >= a]
+
+    scanned: List[Tuple[sublime.Region, List[Span]]] = []
+    for begin, end in gaps:
+        while True:
+            line = view.line(sublime.Region(begin, min(begin + LARGE_FILE_CHUNK_SIZE, end)))
+            scanned.append((line, find_all(pattern, view.substr(line), line.a)))
+            if line.b >= end:
+                break
+            begin = line.b + 1
+
+    with index.lock:
+        # the buffer was modified meanwhile, the scan is not trustworthy
+        if view.change_count() != change_count or index.change_count != change_count or not index.built:
+            return False
+        for line, found in scanned:
+            index.cover(line.a, line.b, found)
+        if not index.gaps(view.size()):
+            index.partial = False
+
+    return True
+
+
+# Private: Scans a large file bit by bit, from the visible region outwards.
+#
+# view - the view, you know
+# deadline - the time to yield at, as given by time.perf_counter
+#
+# Returns whether there is some scanning left to do.
+def scan_progressively(view: sublime.View, deadline: float) -> bool:
+    index = indexes.get(view.buffer_id())
+    pattern = settings.for_view(view).snapshot.pattern
+    if index is None or index.pattern is not pattern:
         return False
 
-    for syntax_ignore in settings.syntax_ignore:
-        if syntax_ignore in view_syntax:
+    point = view.visible_region().a
+    while True:
+        with index.lock:
+            gaps = index.gaps(view.size()) if index.partial else []
+        if not gaps:
+            update_status(view)
+            store_scan(view)
+            return False
+
+        # the chunk nearest to the visible region, in either direction
+        begin, end = min(gaps, key=lambda gap: max(gap[0] - point, point - gap[1], 0))
+        if end <= point:
+            begin = max(begin, end - LARGE_FILE_CHUNK_SIZE)
+        else:
+            begin = max(begin, min(point, end - 1))
+            end = min(end, begin + LARGE_FILE_CHUNK_SIZE)
+
+        # if the buffer is being edited, try again on next slice
+        if not cover_index(view, index, pattern, begin, end) or time.perf_counter() >= deadline:
             return True
 
-    return False
+
+# coalesces the scans requested by bursts of events
+scheduler = ScanScheduler(match_trailing_spaces)
+# runs on_idle once nothing happened in a view for a while
+idle_scheduler = ScanScheduler(on_idle)
+# scans large files in the background, in time slices
+progressive_scan = SlicedTask(scan_progressively)
+# watches the visible views for changes to their visible region (scrolling)
+watcher = ViewportWatcher(on_visible_region_changed)
+
+
+# Private: Checks if the view should be ignored.
+#
+# view - the view to check.
+#
+# Returns True if the view should be ignored, False otherwise.
+def ignore_view(view: sublime.View) -> bool:
+    return view.is_scratch() or settings.for_view(view).ignored
 
 
-# Private: Checks whether the document is bigger than the max_size setting.
+# Private: Checks whether the document is bigger than the max_size setting,
+# while large files are not supported.
 #
 # view - the view, you know
 #
 # Returns True or False.
 def max_size_exceeded(view: sublime.View) -> bool:
-    return view.size() > settings.file_max_size
+    snapshot = settings.snapshot
+    return not snapshot.large_file_mode and view.size() > snapshot.file_max_size
+
+
+# Private: What was last drawn in a view.
+class Highlight(NamedTuple):
+    change_count: int
+    color: str
+    snapshot: SettingsSnapshot
+    spans: Tuple[Span, ...]
+    fingerprint: int
+
+
+# Private: Finds the trailing spaces region after or before a point, wrapping
+# around the end of the buffer.
+#
+# The index of the buffer is bisected, so that nothing is searched unless it
+# is partial (large files). Regions in ignored scopes are skipped.
+#
+# view - the view, you know
+# point - the point to start from
+# forward - whether to look after the point, or before
+#
+# Returns the span of the region, or None if there is none.
+def find_nearest_trailing_region(view: sublime.View, point: int, forward: bool) -> Optional[Span]:
+    snapshot = settings.for_view(view).snapshot
+    pattern = snapshot.pattern
+    index = refresh_index(view, pattern)
+    if index is not None and cover_index(view, index, pattern, 0, view.size()):
+        with index.lock:
+            return nearest_span(view, index, point, forward, snapshot.scope_ignore)
+
+    # the buffer is being modified, go the slow way
+    spans = IntervalIndex(search_trailing_spaces(view, snapshot, None))
+    return nearest_span(view, spans, point, forward, "")
+
+
+# Private: Returns the span after or before a point, wrapping around.
+#
+# view - the view, you know
+# spans - the spans to look into
+# point - the point to start from
+# forward - whether to look after the point, or before
+# selector - the selector matching the ignored scopes
+#
+# Returns the first span found which is not in an ignored scope, or None.
+def nearest_span(view: sublime.View, spans: IntervalIndex, point: int, forward: bool, selector: str) -> Optional[Span]:
+    count = len(spans)
+    if forward:
+        start, step = bisect_right(spans.begins, point), 1
+    else:
+        start, step = bisect_left(spans.begins, point) - 1, -1
+
+    for i in range(count):
+        span = spans.span((start + i * step) % count)
+        if not selector or not view.match_selector(span[0], selector):
+            return span
+    return None
 
 
 # Private: Highlights specified regions as trailing spaces.
 #
 # It will use the scope enforced by the state of the toggable highlighting.
+# Regions are only pushed to Sublime Text when they differ from what is
+# already drawn, which is the common case when only the cursor moved. When
+# only part of the view was searched, and the buffer did not change since the
+# last drawing, the regions drawn outside that part are kept.
 #
 # view - the view, you know
 # regions - regions qualified as trailing spaces
+# searched - the region the regions were searched in, if not the whole buffer
 #
 # Returns nothing.
-def highlight_trailing_spaces_regions(view: sublime.View, regions: List[sublime.Region]) -> None:
-    view.erase_regions(HIGHLIGHT_REGION_KEY)
-    if regions:
-        view.add_regions(HIGHLIGHT_REGION_KEY, regions, current_highlight_color or "", "", sublime.HIDE_ON_MINIMAP)
+@profiler.timed("highlight")
+def highlight_trailing_spaces_regions(
+    view: sublime.View, regions: List[sublime.Region], searched: Optional[sublime.Region] = None
+) -> None:
+    snapshot = settings.for_view(view).snapshot
+    change_count = view.change_count()
+    color = current_highlight_color or ""
+    spans = [(region.a, region.b) for region in regions]
+
+    last = highlights.get(view.id())
+    if last is not None and (last.change_count, last.color, last.snapshot) != (change_count, color, snapshot):
+        last = None
+    if searched is not None and last is not None:
+        # the searched region is aligned to lines, so are the drawn spans
+        lo = bisect_left(last.spans, (searched.a, -1))
+        hi = bisect_right(last.spans, (searched.b, view.size() + 1))
+        if lo > 0 or hi < len(last.spans):
+            spans = list(last.spans[:lo]) + spans + list(last.spans[hi:])
+            if not snapshot.include_current_line:
+                lines = [(line.a, line.b) for line in map(view.line, view.sel())
+                         if line.b < searched.a or line.a > searched.b]
+                if lines:
+                    spans = IntervalIndex(spans).outside_all(lines)
+
+    drawn = tuple(spans)
+    fingerprint = hash(drawn)
+    if last is not None and last.fingerprint == fingerprint and last.spans == drawn:
+        return
+
+    highlights[view.id()] = Highlight(change_count, color, snapshot, drawn, fingerprint)
+    if spans:
+        view.add_regions(HIGHLIGHT_REGION_KEY, [sublime.Region(a, b) for a, b in spans],
+                         color, "", sublime.HIDE_ON_MINIMAP)
+    else:
+        view.erase_regions(HIGHLIGHT_REGION_KEY)
 
 
 # Private: Toggles highlighting of all trailing spaces in the view.
@@ -233,51 +757,161 @@ def clear_trailing_spaces_highlight(window: sublime.Window) -> None:
 
 # Find edited lines since last save, as line numbers, based on diff.
 #
-# It uses a Differ object to compute the diff between the file as red on the
-# disk, and the current buffer (which may differ from the disk's state). See
-# http://docs.python.org/2/library/difflib.html for details about diff codes.
+# It diffs the file as red on the disk against the current buffer (which may
+# differ from the disk's state), only looking for the lines of the buffer which
+# were inserted or changed. See diff.py for details about the algorithm, which
+# runs in near linear time on typical edits.
 #
-# It relies on a full diff, so it may be expensive computation for very large
-# files (diff generation + looping through all lines).
-#
-# old - a buffer of lines, as in "old version"
-# new - a buffer of lines, as in "new version"
+# old - a buffer of lines (or of line hashes), as in "old version"
+# new - a buffer of lines (or of line hashes), as in "new version"
 #
 # Returns the list of edited line numbers.
-def modified_lines_as_numbers(old: List[str], new: List[str]) -> Union[Literal[False], List[int]]:
-    d = difflib.Differ()
-    diffs = d.compare(old, new)
-
-    # Pretty Naive Algorithm (tm):
-    # - split off the "Differ code", to check whether:
-    #   - the line is in either in both files or just b: increment the line number
-    #   - the line is only in b: it qualifies as an edited line!
-    # Starting from -1 as ST2 is internally 0-based for lines.
-    lineNum = -1
-    edited_lines: List[int] = []
-    for line in diffs:
-        code = line[:2]
-        # those lines with "? " are not real! watch out!
-        if code in ("  ", "+ "):
-            lineNum += 1
-        if code == "+ ":
-            edited_lines.append(lineNum)
-
+def modified_lines_as_numbers(old: Sequence[Hashable], new: Sequence[Hashable]) -> Union[Literal[False], List[int]]:
+    edited_lines = changed_lines(old, new)
     return False if not edited_lines else edited_lines
 
 
+# Private: Returns the Python codec of the view's file.
+#
+# view - the view, you know
+#
+# Returns the name of the codec, or None if not supported.
+def file_encoding(view: sublime.View) -> Optional[str]:
+    encoding = view.encoding()
+
+    if encoding == "Undefined":
+        encoding = cast(str, view.settings().get("default_encoding", "UTF-8"))
+
+    if encoding == "Hexadecimal":  # not supported?
+        return None
+
+    match = re.match(r'.+\(([^)]+)\)$', encoding)
+    return match.group(1) if match else encoding
+
+
+# Private: Returns the version of the view's file as found on disk.
+#
+# The file is only read again if its size or modification time changed since
+# last time, so that switching between views does not cause any disk I/O.
+#
+# view - the view, you know
+#
+# Returns the hashes of the file's lines, or None if there is no such file.
+def last_version(view: sublime.View) -> Optional['array[int]']:
+    file_name = view.file_name()
+    # For some reasons, the on_activated hook gets fired on a ghost document
+    # from time to time.
+    if not file_name or view.is_scratch():
+        return None
+
+    encoding = file_encoding(view)
+    if encoding is None:
+        return None
+
+    return snapshots.get(file_name, encoding, settings.snapshot.snapshot_cache_size)
+
+
+# Private: Returns the version of the view's file modified lines are relative
+# to, as set by the modified_lines_base setting: the one on disk, or the one
+# committed in git (falling back to the one on disk outside of repositories).
+#
+# git is only run to resolve the committed version, on the async thread: the
+# UI thread gets the version last resolved.
+#
+# view - the view, you know
+# snapshot - the settings of the view
+# resolve - whether to run git, if needed
+#
+# Returns the hashes of the file's lines, or None if there is no such file.
+def base_version(view: sublime.View, snapshot: SettingsSnapshot, resolve: bool = False) -> Optional['array[int]']:
+    if snapshot.modified_lines_base == "git":
+        file_name = view.file_name()
+        encoding = file_encoding(view)
+        if file_name and encoding and not view.is_scratch():
+            committed = git_bases.get(file_name, encoding, snapshot.snapshot_cache_size, resolve)
+            if committed is not None:
+                return committed
+    return last_version(view)
+
+
+# Private: Returns whether modified lines are tracked as edits, rather than
+# found by diffing the buffer against a base version.
+def tracks_edits(view: sublime.View, snapshot: SettingsSnapshot) -> bool:
+    return (snapshot.modified_lines_tracking == "edits" and snapshot.modified_lines_base == "disk"
+            and view.buffer_id() in dirty_lines)
+
+
+# Private: The modified lines of a buffer, as found by diffing it at some
+# change count against some version of its file.
+class ModifiedLines(NamedTuple):
+    change_count: int
+    base: Optional['array[int]']
+    spans: List[Span]
+
+
 # Private: Find the dirty lines.
 #
+# Depending on the modified_lines_tracking and modified_lines_base settings,
+# they are either the lines touched by the edits made since last save, or the
+# lines found different from the disk's or the committed version (which is the
+# fallback when the edits are unknown, for documents which were not in sync
+# with the disk when first seen).
+#
+# The lines found are kept until the buffer or the version it was diffed
+# against change.
+#
 # view - the view, you know
+# diff - whether to diff, if the lines are not known yet
 #
-# Returns the list of regions matching dirty lines.
-def get_modified_lines(view: sublime.View) -> List[sublime.Region]:
+# Returns the list of spans matching dirty lines, line endings excluded, or
+# None if not known without diffing.
+@profiler.timed("get_modified_lines")
+def get_modified_lines(view: sublime.View, diff: bool = True) -> Optional[List[Span]]:
+    snapshot = settings.for_view(view).snapshot
+    tracked = dirty_lines.get(view.buffer_id())
+    if tracks_edits(view, snapshot):
+        last_row = view.rowcol(view.size())[0]
+        spans: List[Span] = []
+        for row in tracked.rows:  # type: ignore
+            if row > last_row:
+                break
+            line = view.line(view.text_point(row, 0))
+            spans.append((line.a, line.b))
+        return spans
+
+    change_count = view.change_count()
+    base = base_version(view, snapshot)
+    # bases are compared by identity: caches return the same arrays as long as
+    # files don't change
+    known = modified_lines.get(view.buffer_id())
+    if known is not None and known.change_count == change_count and known.base is base:
+        return known.spans
+    if not diff:
+        return None
+
     on_buffer = view.substr(sublime.Region(0, view.size())).splitlines()
-    lines = []
-    line_numbers = modified_lines_as_numbers(on_disk or [], on_buffer)
-    if line_numbers:
-        lines = [view.full_line(view.text_point(number, 0)) for number in line_numbers]
-    return lines
+    line_numbers = modified_lines_as_numbers(base or [], hash_lines(on_buffer))
+    if not line_numbers:
+        spans = []
+    else:
+        lines = IntervalIndex.from_lines(on_buffer)
+        spans = [lines.span(number) for number in line_numbers]
+
+    if view.change_count() == change_count:
+        modified_lines[view.buffer_id()] = ModifiedLines(change_count, base, spans)
+    return spans
+
+
+# Private: The regions to delete from a buffer, as found at some change count
+# with some settings.
+class TrimPlan(NamedTuple):
+    change_count: int
+    snapshot: SettingsSnapshot
+    # the tracker of the lines edited since last save, replaced on save
+    tracked: Optional[DirtyLines]
+    # the version modified lines are relative to, if any
+    base: Optional['array[int]']
+    spans: List[Span]
 
 
 # Private: Finds the trailing spaces regions to be deleted.
@@ -290,62 +924,66 @@ def get_modified_lines(view: sublime.View) -> List[sublime.Region]:
 #
 # Returns a list of regions to be deleted.
 def find_regions_to_delete(view: sublime.View) -> List[sublime.Region]:
+    return [sublime.Region(a, b) for a, b in get_trim_plan(view).spans]
+
+
+# Private: Returns the plan of a deletion.
+#
+# With trim_on_save, plans are made ahead of time on the async thread, once
+# edits settle, so that saving only has to check that the buffer did not
+# change since. Otherwise, or if the plan is stale, it is made right away.
+#
+# view - the view, you know
+#
+# Returns the TrimPlan.
+@profiler.timed("get_trim_plan")
+def get_trim_plan(view: sublime.View) -> TrimPlan:
+    snapshot = settings.for_view(view).snapshot
+    change_count = view.change_count()
+    tracked = dirty_lines.get(view.buffer_id())
+    base = None
+    if snapshot.modified_lines_only and not tracks_edits(view, snapshot):
+        base = base_version(view, snapshot)
+    plan = trim_plans.get(view.buffer_id())
+    if plan is not None and (plan.change_count, plan.snapshot, plan.tracked) == (change_count, snapshot, tracked) \
+            and plan.base is base:
+        return plan
+
     (regions, highlightable) = find_trailing_spaces(view, scan_only_visible=False)
+    spans = [(region.a, region.b) for region in regions]
 
     # Filtering is required in case triming is restricted to dirty regions only.
-    if settings.modified_lines_only:
+    if snapshot.modified_lines_only and spans:
         modified_lines = get_modified_lines(view)
 
-        # If there are no dirty lines, don't do nothing.
-        if not modified_lines:
-            return []
-
-        # Super-private: filters trailing spaces regions to dirty lines only.
-        #
-        # As one cannot perform a smart find_all within arbitrary boundaries, we must do some
-        # extra work:
-        # - we want to loop through the modified lines set, not the whole trailing regions
-        # - but we need a way to match modified lines with trailings to those very regions
-        #
-        # Hence the reversed dict on regions: keys are the text_point of the begining of
-        # each region, values are the region's actual boundaries. As a Region is unhashable,
-        # trailing regions are being recreated later on from those two values.
-        #
-        # We loop then loop through the modified lines: for each line, we get its begining
-        # text_point, and check whether it matches a line with trailing spaces in the
-        # reversed dict. If so, this is a match (a modified line with trailing spaces), so
-        # we can re-create and store a Region for the relevant trailing spaces boundaries.
-        #
-        # Returns the filtered list of trailing spaces regions for the modified lines set.
-        def only_those_with_trailing_spaces() -> List[sublime.Region]:
-            regions_by_begin: Dict[sublime.Point, Tuple[sublime.Point, sublime.Point]] = {}
-            matches: List[sublime.Region] = []
-            for region in regions:
-                begin = view.line(region).begin()
-                regions_by_begin[begin] = (region.begin(), region.end())
-
-            for line in modified_lines:
-                text_point = line.begin()
-                if text_point in regions_by_begin:
-                    matches.append(sublime.Region(regions_by_begin[text_point][0], regions_by_begin[text_point][1]))
-
-            return matches
-
-        regions = only_those_with_trailing_spaces()
-
-    return regions
+        # Keep the trailing spaces regions lying within dirty lines only
+        # (if there are no dirty lines, don't do nothing).
+        spans = IntervalIndex(spans).within_any(modified_lines) if modified_lines else []
+
+    plan = TrimPlan(change_count, snapshot, tracked, base, spans)
+    # the buffer may have changed meanwhile
+    if view.change_count() == change_count:
+        trim_plans[view.buffer_id()] = plan
+    return plan
 
 
 # Private: Deletes the trailing spaces regions.
 #
+# Past the bulk_trim_threshold setting, regions are deleted by bulk instead of
+# one by one.
+#
 # view - the view, you know
 # edit - the Edit object spawned by the deletion command
 #
 # Returns the number of deleted regions.
+@profiler.timed("delete_trailing_regions")
 def delete_trailing_regions(view: sublime.View, edit: sublime.Edit) -> int:
     regions = find_regions_to_delete(view)
 
-    if regions:
+    if len(regions) >= settings.bulk_trim_threshold:
+        bulk_delete_regions(view, edit, regions)
+        return len(regions)
+    elif regions:
         # Trick: reversing the regions takes care of the growing offset while
         # deleting the successive regions.
         regions.reverse()
@@ -356,6 +994,78 @@ def delete_trailing_regions(view: sublime.View, edit: sublime.Edit) -> int:
         return 0
 
 
+# Private: Deletes regions in a few large replacements.
+#
+# Regions are grouped into chunks of contiguous text, each chunk being replaced
+# at once by its trimmed content. The lines tracked as edited are only the
+# trimmed ones, not all the lines replaced. The selection is then moved as if
+# regions had been erased one by one.
+#
+# view - the view, you know
+# edit - the Edit object spawned by the deletion command
+# regions - the regions to delete, sorted and not overlapping
+#
+# Returns nothing.
+def bulk_delete_regions(view: sublime.View, edit: sublime.Edit, regions: List[sublime.Region]) -> None:
+    selection = [(region.a, region.b) for region in view.sel()]
+    offset = regions[0].a
+    text = view.substr(sublime.Region(offset, regions[-1].b))
+
+    chunks = list(chunk_regions(regions, BULK_CHUNK_SIZE))
+    tracked = dirty_lines.get(view.buffer_id())
+    if tracked is not None:
+        # no line is inserted nor deleted: rows stay where they are
+        row = view.rowcol(offset)[0]
+        rows = []
+        end = offset
+        for region in regions:
+            row += text.count("\n", end - offset, region.a - offset)
+            rows.append(row)
+            end = region.a
+        tracked.skip(len(chunks), rows)
+
+    for a, b, chunk in reversed(chunks):
+        replaced = trim(text[a - offset:b - offset], ((region.a, region.b) for region in chunk), a)
+        view.replace(edit, sublime.Region(a, b), replaced)
+
+    begins = [region.a for region in regions]
+    ends = [region.b for region in regions]
+    # removed[i] is the number of characters deleted before the i-th region
+    removed = [0]
+    for region in regions:
+        removed.append(removed[-1] + region.size())
+
+    def shift(point: int) -> int:
+        i = bisect_right(ends, point)
+        if i < len(begins) and begins[i] < point:
+            # within a deleted region
+            return begins[i] - removed[i]
+        return point - removed[i]
+
+    view.sel().clear()
+    view.sel().add_all([sublime.Region(shift(a), shift(b)) for a, b in selection])
+
+
+# Private: Groups sorted regions into chunks spanning at most max_size
+# characters (unless a single region is bigger than that).
+#
+# regions - the regions to group, sorted
+# max_size - the maximum size of a chunk, in characters
+#
+# Yields (begin, end, regions) triples.
+def chunk_regions(
+    regions: List[sublime.Region], max_size: int
+) -> Iterator[Tuple[int, int, List[sublime.Region]]]:
+    chunk: List[sublime.Region] = []
+    for region in regions:
+        if chunk and region.b - chunk[0].a > max_size:
+            yield (chunk[0].a, chunk[-1].b, chunk)
+            chunk = []
+        chunk.append(region)
+    if chunk:
+        yield (chunk[0].a, chunk[-1].b, chunk)
+
+
 # Public: Toggles the highlighting on or off.
 class ToggleTrailingSpacesCommand(sublime_plugin.WindowCommand):
     def run(self) -> None:
@@ -394,111 +1104,264 @@ class ToggleTrailingSpacesModifiedLinesOnlyCommand(sublime_plugin.WindowCommand)
 # Public: Matches and highlights trailing spaces on key events, according to the
 # current settings.
 class TrailingSpacesListener(sublime_plugin.EventListener):
+    @profiler.timed("on_modified_async", 1)
     def on_modified_async(self, view: sublime.View) -> None:
-        if settings.enabled:
-            match_trailing_spaces(view)
+        snapshot = settings.snapshot
+        if snapshot.enabled:
+            scheduler.schedule(view, snapshot.debounce_delay)
 
+    @profiler.timed("on_selection_modified_async", 1)
     def on_selection_modified_async(self, view: sublime.View) -> None:
-        if settings.enabled:
-            match_trailing_spaces(view)
+        snapshot = settings.snapshot
+        if snapshot.enabled:
+            scheduler.schedule(view, snapshot.debounce_delay)
 
+    @profiler.timed("on_activated_async", 1)
     def on_activated_async(self, view: sublime.View) -> None:
-        if settings.modified_lines_only:
+        snapshot = settings.for_view(view).snapshot
+        if snapshot.modified_lines_only or snapshot.highlight_modified_lines_only:
             self.freeze_last_version(view)
 
-        if settings.enabled:
-            match_trailing_spaces(view)
+        if snapshot.enabled:
+            scheduler.schedule(view, 0)
 
             # continuously watch view for changes to the visible region
-            if view.id() not in active_views:
-                # track
-                active_views[view.id()] = view.visible_region()
-                self.update_on_region_change(view)
+            watcher.watch(view, snapshot.update_interval)
 
-    def on_pre_save(self, view: sublime.View) -> None:
-        if settings.modified_lines_only:
-            self.freeze_last_version(view)
+    def on_load(self, view: sublime.View) -> None:
+        if not view.is_dirty():
+            dirty_lines[view.buffer_id()] = DirtyLines()
 
-        if settings.trim_on_save:
+    @profiler.timed("on_pre_save", 1)
+    def on_pre_save(self, view: sublime.View) -> None:
+        if settings.snapshot.trim_on_save:
             view.run_command("delete_trailing_spaces")
 
+    def on_post_save(self, view: sublime.View) -> None:
+        dirty_lines[view.buffer_id()] = DirtyLines()
+        # counting may read and hash the file saved: off the UI thread
+        sublime.set_timeout_async(lambda: update_status(view), 0)
+
+        snapshot = settings.for_view(view).snapshot
+        if snapshot.scan_cache:
+            sublime.set_timeout_async(lambda: store_scan(view), 0)
+        if snapshot.enabled and snapshot.highlight_modified_lines_only:
+            # the lines edited may have changed without the document changing
+            highlights.pop(view.id(), None)
+            scheduler.schedule(view, 0)
+
     def on_close(self, view: sublime.View) -> None:
         # untrack
-        active_views.pop(view.id(), None)
+        watcher.unwatch(view)
+        scheduler.cancel(view)
+        idle_scheduler.cancel(view)
+        if not view.clones():
+            progressive_scan.cancel(view)
+            indexes.pop(view.buffer_id(), None)
+            scan_memos.pop(view.buffer_id(), None)
+            trim_plans.pop(view.buffer_id(), None)
+            modified_lines.pop(view.buffer_id(), None)
+            modified_counts.pop(view.buffer_id(), None)
+            scope_filters.pop(view.buffer_id(), None)
+            dirty_lines.pop(view.buffer_id(), None)
+        profiler.forget(view.id())
+        settings.forget(view)
+        highlights.pop(view.id(), None)
+
+    # Let's cache the persisted version of the document's buffer ahead of
+    # time, so that we always have a decent version of "what's on the disk" (or
+    # in git) to diff against when trimming modified lines only. Snapshots are
+    # shared by all views into a file, and only re-read when the file changed
+    # on disk.
+    def freeze_last_version(self, view: sublime.View) -> None:
+        base_version(view, settings.for_view(view).snapshot, resolve=True)
+
 
-    def update_on_region_change(self, view: sublime.View) -> None:
-        # remove views not currently visible
-        if not self.is_view_visible(view):
-            active_views.pop(view.id(), None)
+# Public: Keeps the index of trailing spaces regions and the dirty lines in sync
+# with buffer edits.
+class TrailingSpacesTextChangeListener(sublime_plugin.TextChangeListener):
+    @classmethod
+    def is_applicable(cls, buffer: sublime.Buffer) -> bool:
+        return True
+
+    def on_text_changed(self, changes: List[sublime.TextChange]) -> None:
+        view = self.buffer.primary_view()
+        if not view:
             return
 
-        # compare the currently visible region to the previous (if any) and
-        # update if there were changes
-        if view.visible_region() != active_views.get(view.id(), view.visible_region()):
-            match_trailing_spaces(view)
-            active_views[view.id()] = view.visible_region()
-
-        # continue only if the view is still active
-        if settings.enabled and view.id() in active_views:
-            sublime.set_timeout_async(lambda: self.update_on_region_change(view), settings.update_interval)
-
-    # Toggling messes with what is red from the disk, and it breaks the diff
-    # used when modified_lines_only is true. Honestly, I don't know why (yet).
-    # Anyway, let's cache the persisted version of the document's buffer for
-    # later use on specific event, so that we always have a decent version of
-    # "what's on the disk" to work with.
-    def freeze_last_version(self, view: sublime.View) -> None:
-        global on_disk
+        with profiler.stage(view, "on_text_changed"):
+            recorded = [(c.a.pt, c.b.pt, len(c.str)) for c in changes]
+            index = indexes.get(self.buffer.id())
+            if index is not None:
+                with index.lock:
+                    index.record(recorded, view.change_count())
 
-        file_name = view.file_name()
-        # For some reasons, the on_activated hook gets fired on a ghost document
-        # from time to time.
-        if file_name and not view.is_scratch() and isfile(file_name):
-            encoding = view.encoding()
+            scope_filter = scope_filters.get(self.buffer.id())
+            if scope_filter is not None:
+                scope_filter.record(recorded, view.change_count())
 
-            if encoding == "Undefined":
-                encoding = cast(str, view.settings().get("default_encoding", "UTF-8"))
+            tracked = dirty_lines.get(self.buffer.id())
+            if tracked is not None:
+                for c in changes:
+                    tracked.record(c.a.row, c.a.col, c.b.row, c.b.col, c.str)
 
-            if encoding == "Hexadecimal":  # not supported?
-                on_disk = None
-                return
+    def on_revert(self) -> None:
+        self.invalidate()
 
-            match = re.match(r'.+\(([^)]+)\)$', encoding)
-            encoding = match.group(1) if match else encoding
+    def on_reload(self) -> None:
+        self.invalidate()
 
-            with codecs.open(file_name, "r", encoding) as f:
-                on_disk = f.read().splitlines()
+    # The buffer is in sync with the disk again.
+    def invalidate(self) -> None:
+        index = indexes.get(self.buffer.id())
+        if index is not None:
+            with index.lock:
+                index.invalidate()
+        scope_filters.pop(self.buffer.id(), None)
 
-    def is_view_visible(self, view: sublime.View) -> bool:
-        window = view.window()
-        if not window:
-            return False
+        dirty_lines[self.buffer.id()] = DirtyLines()
 
-        # panel views don't trigger on_close but are also not valid anymore
-        # after being hidden, so try to detect these cases here
-        if view.size() == 0 and not view.file_name():
-            return False
 
-        # see if this view is visible in its group
-        group = window.get_view_index(view)[0]
-        if group != -1:
-            active_view_in_group = window.active_view_in_group(group)
-            # won't be present if a html sheet is active
-            if active_view_in_group:
-                return view.id() == active_view_in_group.id()
+# Public: Reports or deletes the trailing spaces of all files in the project
+# folders, in parallel processes.
+#
+# Files matching the folder_exclude_patterns, file_exclude_patterns and
+# binary_file_patterns settings of Sublime Text are skipped, as well as binary
+# files, files of ignored syntaxes and, when deleting, files with unsaved
+# changes.
+class DeleteTrailingSpacesInProjectCommand(sublime_plugin.WindowCommand):
+    def run(self, dry_run: bool = False) -> None:
+        command = core_command(settings.python_executable)
+        if command is None:
+            sublime.status_message("Python was not found, please set python_executable in Trailing Spaces settings.")
+            return
 
-        # check if this view is the active panel
-        active_panel = window.active_panel() or ""
+        snapshot = settings.snapshot
+        regexp = settings.regexp
+        # the processes would fail on every file, don't even start them
+        try:
+            compile_file_pattern(regexp, snapshot.include_empty_lines)
+        except re.error as e:
+            sublime.status_message("Trailing Spaces: invalid regexp %r (%s)" % (regexp, e))
+            return
+        command += ['--regexp', regexp]
+        if not snapshot.include_empty_lines:
+            command.append('--no-include-empty-lines')
+        if not dry_run:
+            command.append('--fix')
 
-        # find_output_panel only works without the "output."" prefix
-        if active_panel.startswith("output."):
-            active_panel = active_panel[len("output."):]
+        view = self.window.active_view()
+        preferences = view.settings() if view else sublime.load_settings('Preferences.sublime-settings')
+        folder_exclude_patterns = cast(List[str], preferences.get('folder_exclude_patterns', []))
+        file_exclude_patterns = cast(List[str], preferences.get('file_exclude_patterns', [])) + \
+            cast(List[str], preferences.get('binary_file_patterns', []))
+        unsaved = set() if dry_run else {view.file_name() for view in self.window.views() if view.is_dirty()}
+        syntax_ignore = snapshot.syntax_ignore
+
+        def ignored(path: str) -> bool:
+            if path in unsaved:
+                return True
+            if not syntax_ignore:
+                return False
+            syntax = sublime.find_syntax_for_file(path)
+            return syntax is not None and any(ignore in syntax.path for ignore in syntax_ignore)
+
+        window_id = self.window.id()
+
+        def on_progress(scanned: int, total: int) -> None:
+            if window_id in project_jobs:
+                sublime.status_message("Trailing Spaces: %d/%d files" % (scanned, total))
+
+        def on_done(report: ProjectReport) -> None:
+            project_jobs.pop(window_id, None)
+            self.show_report(report, dry_run)
+
+        paths = project_files(self.window.folders(), folder_exclude_patterns, file_exclude_patterns, ignored)
+        job = ProjectJob(command, paths, os.cpu_count() or 1, on_progress, on_done)
+        project_jobs[window_id] = job
+        job.start()
+        sublime.status_message("Trailing Spaces: listing files…")
+
+    def is_enabled(self, dry_run: bool = False) -> bool:
+        return bool(self.window.folders()) and self.window.id() not in project_jobs
+
+    def show_report(self, report: ProjectReport, dry_run: bool) -> None:
+        action = "" if dry_run else "deleted "
+        lines = ["%s: %s%d trailing spaces region%s" % (path, action, count, 's' if count > 1 else '')
+                 for path, count in report.files]
+        lines += ["%s: %s" % (path, error) for path, error in report.errors]
+
+        regions = sum(count for _, count in report.files)
+        summary = "%s%d trailing spaces region%s in %d file%s (%d file%s scanned)" % (
+            "Deleted " if not dry_run else "", regions, 's' if regions != 1 else '',
+            len(report.files), 's' if len(report.files) != 1 else '',
+            report.scanned, 's' if report.scanned != 1 else '')
+        if report.cancelled:
+            summary += ", cancelled"
+        lines.append(summary)
+
+        panel = self.window.create_output_panel("trailing_spaces")
+        panel.settings().set("result_file_regex", r"^(.+?): (?:deleted )?\d+ trailing spaces regions?$")
+        panel.run_command("append", {"characters": "\n".join(lines) + "\n"})
+        self.window.run_command("show_panel", {"panel": "output.trailing_spaces"})
+        sublime.status_message(summary)
+
+
+# Public: Cancels the running project-wide deletion (or report).
+class CancelTrailingSpacesInProjectCommand(sublime_plugin.WindowCommand):
+    def run(self) -> None:
+        job = project_jobs.get(self.window.id())
+        if job:
+            job.cancel()
+            sublime.status_message("Trailing Spaces: cancelling…")
 
-        panel_view = window.find_output_panel(active_panel)
-        if panel_view and view.id() == panel_view.id():
-            return True
+    def is_enabled(self) -> bool:
+        return self.window.id() in project_jobs
 
-        return False
+
+# Public: Prints the timings recorded while the profiling setting is on to the
+# console.
+class TrailingSpacesProfilingSummaryCommand(sublime_plugin.WindowCommand):
+    def run(self) -> None:
+        print("Trailing Spaces: timings of the last %d calls, per view" % WINDOW)
+        print(profiler.summary())
+        self.window.run_command("show_panel", {"panel": "console"})
+
+
+# Public: Moves the selection to the next trailing spaces region, or to the
+# previous one.
+class NextTrailingSpacesCommand(sublime_plugin.TextCommand):
+    def run(self, edit: sublime.Edit, forward: bool = True) -> None:
+        sel = self.view.sel()
+        if forward:
+            point = sel[-1].end() if len(sel) else 0
+        else:
+            point = sel[0].begin() if len(sel) else self.view.size()
+
+        found = find_nearest_trailing_region(self.view, point, forward)
+        if found is None:
+            sublime.status_message("No trailing spaces found")
+            return
+
+        region = sublime.Region(*found)
+        sel.clear()
+        sel.add(region)
+        self.view.show(region)
+
+
+# Public: Selects all the trailing spaces regions, with as many cursors.
+class SelectTrailingSpacesCommand(sublime_plugin.TextCommand):
+    def run(self, edit: sublime.Edit) -> None:
+        (regions, highlightable) = find_trailing_spaces(self.view, scan_only_visible=False)
+        if not regions:
+            sublime.status_message("No trailing spaces found")
+            return
+
+        sel = self.view.sel()
+        sel.clear()
+        sel.add_all(regions)
+        self.view.show(regions[0])
+        sublime.status_message("Selected %d trailing spaces region%s" % (len(regions), 's' if len(regions) > 1 else ''))
 
 
 # Public: Deletes the trailing spaces.